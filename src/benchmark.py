@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+import getopt, json, os, platform, random, sys, tempfile, time, tracemalloc
+
+import rulegenerator
+
+RULES = [0, 30, 90, 110, 137, 255]
+SIZES = [10**3, 10**4, 10**5, 10**6, 10**7]
+SEEDS = ['single', 'random']
+ENGINES = ['reference', 'python', 'numpy', 'bitpacked', 'lazy', 'stream', 'fix_width', 'to_image', 'main']
+# the pure python engines take minutes past this size
+PYTHON_ENGINES = ['reference', 'python']
+PYTHON_MAX_CELLS = 10**6
+
+def seed_config(seed):
+    if seed == 'single':
+        return '010'
+    generator = random.Random(0)
+    return ''.join(generator.choice('01') for i in range(101))
+
+def grid_size(cells, initial_config, wrapped):
+    # generations and width of a roughly square grid of about `cells` cells
+    if wrapped:
+        width = max(int(cells**0.5), len(initial_config))
+        if width % 2 == 0:
+            width += 1
+        return max(cells // width, 1), width
+    generations = 1
+    while (generations + 1) * rulegenerator.light_cone_width(initial_config, generations + 1) <= cells:
+        generations += 1
+    return generations, rulegenerator.light_cone_width(initial_config, generations)
+
+def consume(rows):
+    for row in rows:
+        pass
+
+def run_main(generations, initial_config, rule_num, wrap_width):
+    path = os.path.join(tempfile.gettempdir(), 'rulegenerator_benchmark.png')
+    argv = ['rulegenerator.py', '-i', initial_config, '-r', str(rule_num), '-g', str(generations), '-o', path]
+    if wrap_width is not None:
+        argv += ['--wrapped', str(wrap_width)]
+    rulegenerator.main(argv)
+
+def bench_function(engine, generations, initial_config, rule_num, wrap_width, width):
+    # the call an engine is timed on, and the setup it needs beforehand
+    if engine == 'reference':
+        if wrap_width is None:
+            engine_function = rulegenerator.even_rules if rule_num % 2 == 0 else rulegenerator.odd_rules
+            return lambda: engine_function(generations, initial_config, rule_num)
+        engine_function = rulegenerator.even_rules_wrap if rule_num % 2 == 0 else rulegenerator.odd_rules_wrap
+        return lambda: engine_function(generations, initial_config, rule_num, wrap_width)
+    if engine == 'lazy' and wrap_width is None:
+        # the light cone, which only LazyLattice gives unbounded
+        return lambda: consume(rulegenerator.LazyLattice(generations, initial_config, rule_num))
+    if engine in ('python', 'numpy', 'bitpacked', 'lazy'):
+        if wrap_width is None:
+            return lambda: consume(rulegenerator.generate_rule(generations, initial_config, rule_num, backend=engine))
+        return lambda: consume(rulegenerator.generate_rule_wrap(generations, initial_config, rule_num, wrap_width, backend=engine))
+    if engine == 'stream':
+        return lambda: consume(rulegenerator.iter_rule(initial_config, rule_num, wrap_width=wrap_width, generations=generations))
+    if engine == 'fix_width':
+        # on the deques of the python engines, cropped to half their width
+        if wrap_width is None:
+            auto_lattice = rulegenerator.vectorized_rules(generations, initial_config, rule_num)
+        else:
+            auto_lattice = rulegenerator.vectorized_rules_wrap(generations, initial_config, rule_num, wrap_width)
+        grid = rulegenerator.Lattice(auto_lattice).to_deques()
+        return lambda: rulegenerator.fix_width(grid, len(grid[0]) // 2, in_place=False)
+    if engine == 'to_image':
+        grid = rulegenerator.iter_rule(initial_config, rule_num, wrap_width=wrap_width, generations=generations)
+        grid = rulegenerator.Lattice(rulegenerator.pack_cells(list(grid)), width, packed=True)
+        path = os.path.join(tempfile.gettempdir(), 'rulegenerator_benchmark.png')
+        return lambda: rulegenerator.to_image(grid, path)
+    if engine == 'main':
+        return lambda: run_main(generations, initial_config, rule_num, wrap_width)
+    raise ValueError("Unknown engine: " + str(engine))
+
+def measure(function, repeat, memory):
+    seconds = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if seconds is None or elapsed < seconds:
+            seconds = elapsed
+
+    peak_bytes = None
+    if memory:
+        # a separate run, as tracing slows the pure python engines down
+        tracemalloc.start()
+        function()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak_bytes
+
+def run_benchmarks(engines=ENGINES, rules=RULES, sizes=SIZES, seeds=SEEDS, modes=('unbounded', 'wrapped'),
+                   repeat=3, memory=True, python_max_cells=PYTHON_MAX_CELLS, report=None):
+    results = []
+    for mode in modes:
+        for cells in sizes:
+            for seed in seeds:
+                initial_config = seed_config(seed)
+                generations, width = grid_size(cells, initial_config, mode == 'wrapped')
+                wrap_width = width if mode == 'wrapped' else None
+                for rule_num in rules:
+                    for engine in engines:
+                        if engine in PYTHON_ENGINES and generations * width > python_max_cells:
+                            continue
+                        function = bench_function(engine, generations, initial_config, rule_num, wrap_width, width)
+                        seconds, peak_bytes = measure(function, repeat, memory)
+                        result = {'engine': engine, 'mode': mode, 'rule': rule_num, 'seed': seed,
+                                  'generations': generations, 'width': width, 'cells': generations * width,
+                                  'seconds': seconds, 'cells_per_second': generations * width / seconds if seconds > 0 else None,
+                                  'peak_bytes': peak_bytes}
+                        results.append(result)
+                        if report is not None:
+                            report(result)
+    return results
+
+def environment():
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {'python': platform.python_version(), 'numpy': numpy_version, 'platform': platform.platform(),
+            'processor': platform.processor(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def print_result(result):
+    peak = '-' if result['peak_bytes'] is None else str(result['peak_bytes'] // 1024) + ' KiB'
+    print('%-10s %-9s rule %3d %-6s %8d x %-8d %10.4f s %12s' % (result['engine'], result['mode'], result['rule'], result['seed'],
+                                                               result['generations'], result['width'], result['seconds'], peak))
+
+def split_list(arg, convert=str):
+    return [convert(x) for x in arg.split(',') if x != '']
+
+def main(argv):
+    output = 'benchmark.json'
+    options = {}
+    try:
+        opts, args = getopt.getopt(argv[1:], "ho:", ["engines=", "rules=", "sizes=", "seeds=", "modes=", "repeat=",
+                                                      "no-memory", "python-max-cells="])
+    except getopt.GetoptError:
+        print("Type " + argv[0] + " -h for help")
+        return 2
+    try:
+        for opt, arg in opts:
+            if opt == '-h':
+                print("Usage: " + argv[0] + " [-o <json output>] [--engines <list>] [--rules <list>] [--sizes <list>] [--seeds <list>] [--modes <list>] [--repeat <n>] [--no-memory] [--python-max-cells <n>]\n")
+                print("Lists are separated by commas. Engines: " + ','.join(ENGINES) + ". Seeds: " + ','.join(SEEDS) + ". Modes: unbounded,wrapped.")
+                print("Sizes are numbers of cells. The reference and python engines are skipped for grids of more than --python-max-cells cells (default " + str(PYTHON_MAX_CELLS) + ").")
+                return 0
+            elif opt == '-o':
+                output = arg
+            elif opt == '--engines':
+                options['engines'] = split_list(arg)
+            elif opt == '--rules':
+                options['rules'] = split_list(arg, int)
+            elif opt == '--sizes':
+                options['sizes'] = split_list(arg, lambda x: int(float(x)))
+            elif opt == '--seeds':
+                options['seeds'] = split_list(arg)
+            elif opt == '--modes':
+                options['modes'] = split_list(arg)
+            elif opt == '--repeat':
+                options['repeat'] = int(arg)
+            elif opt == '--no-memory':
+                options['memory'] = False
+            elif opt == '--python-max-cells':
+                options['python_max_cells'] = int(float(arg))
+    except ValueError:
+        print("Entered number is not a valid integer.")
+        return 2
+
+    results = run_benchmarks(report=print_result, **options)
+    try:
+        with open(output, 'w') as json_file:
+            json.dump({'environment': environment(), 'results': results}, json_file, indent=1)
+    except IOError:
+        print("Failed to write to file: ")
+        print(output)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
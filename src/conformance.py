@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+
+import getopt, hashlib, json, os, random, sys, tempfile
+
+import rulegenerator
+
+# The grids of the original deque engines (even_rules, odd_rules,
+# even_rules_wrap and odd_rules_wrap) for every rule, over the initial
+# configurations, numbers of generations and wrap widths below, are kept in
+# golden.json as one digest per rule and wrap width. Every other backend has
+# to give the same grids, down to the background of the odd rules, the
+# first generation and the growth of the wrapped grids before they wrap
+
+SEEDS = ['1', '010', '0110', '1101011', '100000001', '0010111011']
+GENERATIONS = [0, 1, 2, 3, 30]
+# 12 does not fit the odd initial configurations, 3 is narrower than most
+# of them (the original engines fail on widths 1 and 2)
+WRAP_WIDTHS = [None, 3, 9, 15, 31, 12]
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden.json')
+
+def reference_rule(generations, initial_config, rule_num, wrap_width=None):
+    if wrap_width is None:
+        if rule_num % 2 == 0:
+            return rulegenerator.even_rules(generations, initial_config, rule_num)
+        return rulegenerator.odd_rules(generations, initial_config, rule_num)
+    if rule_num % 2 == 0:
+        return rulegenerator.even_rules_wrap(generations, initial_config, rule_num, wrap_width)
+    return rulegenerator.odd_rules_wrap(generations, initial_config, rule_num, wrap_width)
+
+def backend_rule(backend):
+    # a function like reference_rule for one of the generate_rule backends
+    def generate(generations, initial_config, rule_num, wrap_width=None):
+        if wrap_width is None:
+            return rulegenerator.generate_rule(generations, initial_config, rule_num, backend=backend)
+        return rulegenerator.generate_rule_wrap(generations, initial_config, rule_num, wrap_width, backend=backend)
+    return generate
+
+def stored_rule(generations, initial_config, rule_num, wrap_width=None):
+    path = os.path.join(tempfile.gettempdir(), 'rulegenerator_conformance.grid')
+    if wrap_width is None:
+        return rulegenerator.generate_rule(generations, initial_config, rule_num, path=path)
+    return rulegenerator.generate_rule_wrap(generations, initial_config, rule_num, wrap_width, path=path)
+
+# one cache for every case, so that slicing and continuing its grids get
+# checked as well
+rule_cache = None
+
+def cached_rule(generations, initial_config, rule_num, wrap_width=None):
+    global rule_cache
+    import rulecache
+    if rule_cache is None:
+        rule_cache = rulecache.RuleCache(max_bytes=2**20)
+    if wrap_width is None:
+        return rule_cache.generate_rule(generations, initial_config, rule_num)
+    return rule_cache.generate_rule_wrap(generations, initial_config, rule_num, wrap_width)
+
+def torus_rule(engine):
+    # a function like reference_rule for the wrapped-only engines, which
+    # leave the widths that do not fit the initial configuration to the
+    # original engines
+    def generate(generations, initial_config, rule_num, wrap_width):
+        if not rulegenerator.wrap_supported(initial_config, wrap_width):
+            return reference_rule(generations, initial_config, rule_num, wrap_width)
+        return engine(generations, initial_config, rule_num, wrap_width)
+    return generate
+
+def parallel_rule(generations, initial_config, rule_num, wrap_width):
+    import ruleparallel
+    return ruleparallel.parallel_rules_wrap(generations, initial_config, rule_num, wrap_width, workers=3, halo=2)
+
+# each backend with the boundary modes it gives the reference grids for
+BACKENDS = {
+    'python': (backend_rule('python'), ('unbounded', 'wrapped')),
+    'numpy': (backend_rule('numpy'), ('unbounded', 'wrapped')),
+    'bitpacked': (backend_rule('bitpacked'), ('unbounded', 'wrapped')),
+    'stored': (stored_rule, ('unbounded', 'wrapped')),
+    'cache': (cached_rule, ('unbounded', 'wrapped')),
+    'lazy': (backend_rule('lazy'), ('wrapped',)),
+    'cycle': (torus_rule(rulegenerator.cycle_rules_wrap), ('wrapped',)),
+    'parallel': (torus_rule(parallel_rule), ('wrapped',)),
+}
+
+def grid_digest(grid, digest=None):
+    if digest is None:
+        digest = hashlib.blake2b(digest_size=8)
+    rows = 0
+    for row in grid:
+        cells = bytes(bytearray(row))
+        digest.update(len(cells).to_bytes(8, 'little'))
+        digest.update(cells)
+        rows += 1
+    digest.update(rows.to_bytes(8, 'little'))
+    return digest
+
+def cases():
+    for initial_config in SEEDS:
+        for generations in GENERATIONS:
+            yield generations, initial_config
+
+def group_digest(generate, rule_num, wrap_width):
+    # one digest for the grids of every case of a rule and wrap width
+    digest = hashlib.blake2b(digest_size=8)
+    for generations, initial_config in cases():
+        if wrap_width is None:
+            grid_digest(generate(generations, initial_config, rule_num), digest)
+        else:
+            grid_digest(generate(generations, initial_config, rule_num, wrap_width), digest)
+    return digest.hexdigest()
+
+def record(path=GOLDEN_PATH, rules=range(256)):
+    digests = {}
+    for rule_num in rules:
+        digests[str(rule_num)] = [group_digest(reference_rule, rule_num, wrap_width) for wrap_width in WRAP_WIDTHS]
+    with open(path, 'w') as golden_file:
+        json.dump({'seeds': SEEDS, 'generations': GENERATIONS, 'wrap_widths': WRAP_WIDTHS, 'digests': digests},
+                  golden_file, indent=0, sort_keys=True)
+
+def first_difference(generate, rule_num, wrap_width):
+    # the first case of a group whose grid differs from the reference
+    for generations, initial_config in cases():
+        arguments = (generations, initial_config, rule_num) + (() if wrap_width is None else (wrap_width,))
+        if grid_digest(generate(*arguments)).digest() != grid_digest(reference_rule(*arguments)).digest():
+            return arguments
+    return None
+
+def check(backends=None, rules=range(256), path=GOLDEN_PATH, report=print):
+    # returns the cases at which a backend differs from golden.json, as
+    # (backend, (generations, initial_config, rule_num[, wrap_width]))
+    with open(path) as golden_file:
+        golden = json.load(golden_file)
+    if golden['seeds'] != SEEDS or golden['generations'] != GENERATIONS or golden['wrap_widths'] != WRAP_WIDTHS:
+        raise ValueError("The golden file was recorded for other cases; record it again.")
+
+    failures = []
+    for backend in backends or sorted(BACKENDS):
+        generate, modes = BACKENDS[backend]
+        for rule_num in rules:
+            for wrap_width, expected in zip(WRAP_WIDTHS, golden['digests'][str(rule_num)]):
+                if ('unbounded' if wrap_width is None else 'wrapped') not in modes:
+                    continue
+                if group_digest(generate, rule_num, wrap_width) != expected:
+                    arguments = first_difference(generate, rule_num, wrap_width)
+                    failures.append((backend, arguments))
+                    if report is not None:
+                        report(backend + " differs at " + repr(arguments))
+    return failures
+
+def fuzz(iterations, seed=0, backends=None, report=print):
+    # differential testing on random cases against the reference engines
+    generator = random.Random(seed)
+    failures = []
+    for i in range(iterations):
+        initial_config = ''.join(generator.choice('01') for j in range(generator.randint(1, 24)))
+        rule_num = generator.randrange(256)
+        generations = generator.choice([0, 1, 2]) if generator.random() < 0.1 else generator.randint(3, 80)
+        wrap_width = None if generator.random() < 0.5 else generator.randint(1, 90)
+        arguments = (generations, initial_config, rule_num) + (() if wrap_width is None else (wrap_width,))
+
+        try:
+            expected = grid_digest(reference_rule(*arguments)).digest()
+        except IndexError:
+            # a case the original engines cannot handle
+            continue
+        for backend in backends or sorted(BACKENDS):
+            generate, modes = BACKENDS[backend]
+            if ('unbounded' if wrap_width is None else 'wrapped') not in modes:
+                continue
+            if grid_digest(generate(*arguments)).digest() != expected:
+                failures.append((backend, arguments))
+                if report is not None:
+                    report(backend + " differs at " + repr(arguments))
+    return failures
+
+def reference_fix_width(rows, width, background):
+    # fix_width written out cell by cell: every generation ends up exactly
+    # `width` cells wide, cropped around its centre or padded with its
+    # background cell
+    if width % 2 == 0:
+        width += 1
+    fixed = []
+    for i, row in enumerate(rows):
+        row = list(row)
+        if len(row) > width:
+            removes = (len(row) - width) // 2
+            row = row[removes:removes + width]
+        elif len(row) < width:
+            fill = row[0] if background is None else background[i]
+            adds = (width - len(row)) // 2
+            row = [fill]*adds + row + [fill]*(width - len(row) - adds)
+        fixed.append(row)
+    return fixed
+
+def fix_width_grids(arguments):
+    # the grid of a case as deques and as each kind of Lattice
+    grids = {'deque': reference_rule(*arguments)}
+    for backend in ('numpy', 'bitpacked'):
+        grids[backend] = backend_rule(backend)(*arguments)
+    if len(arguments) == 3:
+        grids['lazy'] = rulegenerator.LazyLattice(*arguments)
+    else:
+        grids['lazy'] = backend_rule('lazy')(*arguments)
+    if len(arguments) == 4 and rulegenerator.wrap_supported(arguments[1], arguments[3]):
+        grids['cycle'] = rulegenerator.cycle_rules_wrap(*arguments)
+    return grids
+
+def fuzz_fix_width(iterations, seed=0, report=print):
+    # fix_width on every kind of grid against reference_fix_width, cropping
+    # and padding each random case
+    generator = random.Random(seed)
+    failures = []
+    for i in range(iterations):
+        initial_config = ''.join(generator.choice('01') for j in range(generator.randint(1, 24)))
+        rule_num = generator.randrange(256)
+        generations = generator.randint(0, 60)
+        wrap_width = None if generator.random() < 0.5 else generator.randint(1, 90)
+        arguments = (generations, initial_config, rule_num) + (() if wrap_width is None else (wrap_width,))
+        try:
+            grids = fix_width_grids(arguments)
+        except IndexError:
+            continue
+
+        for kind, grid in sorted(grids.items()):
+            rows = [list(row) for row in grid]
+            grid_width = len(rows[0]) if rows else 1
+            background = rulegenerator.background_cells(len(rows), rule_num)
+            if kind != 'lazy' and generator.random() < 0.5:
+                # a LazyLattice always pads with its own background
+                background = None
+            for width in (generator.randint(1, grid_width), generator.randint(grid_width, grid_width + 30)):
+                expected = reference_fix_width(rows, width, background)
+                fixed = rulegenerator.fix_width(grid, width, background, in_place=False)
+                if [list(row) for row in fixed] != expected:
+                    failures.append(('fix_width ' + kind, arguments + (width,)))
+                    if report is not None:
+                        report("fix_width on " + kind + " differs at " + repr(arguments + (width,)))
+    return failures
+
+def fuzz_fixed_rows(iterations, seed=0, report=print):
+    # the rows the command line writes for unbounded grids against the
+    # reference engines: the streamed rows of iter_rule with and without a
+    # fixed width, and fixed_width_rules, the --fixedwidth path without NumPy
+    generator = random.Random(seed)
+    failures = []
+    for i in range(iterations):
+        initial_config = ''.join(generator.choice('01') for j in range(generator.randint(1, 24)))
+        rule_num = generator.randrange(256)
+        generations = generator.randint(1, 60)
+        arguments = (generations, initial_config, rule_num)
+        rows = [list(row) for row in reference_rule(*arguments)]
+        width = rulegenerator.rule_width(generations, initial_config, rule_num)
+        grids = {'iter_rule': (rows, rulegenerator.iter_rule(initial_config, rule_num, generations=generations, width=width))}
+
+        # the fixed widths are odd, as the command line rounds them up
+        fixed_width = 2*generator.randint(0, len(rows[0]) + 15) + 1
+        fixed = reference_fix_width(rows, fixed_width, rulegenerator.background_cells(len(rows), rule_num))
+        offset = rulegenerator.fixed_width_offset(generations, initial_config, rule_num, fixed_width)
+        grids['iter_rule fixed width'] = (fixed, rulegenerator.iter_rule(initial_config, rule_num, generations=generations,
+                                                                         width=fixed_width, offset=offset))
+        grids['fixed_width_rules'] = (fixed, rulegenerator.fixed_width_rules(generations, initial_config, rule_num, fixed_width))
+
+        for kind, (expected, grid) in sorted(grids.items()):
+            if [list(row) for row in grid] != expected:
+                failures.append((kind, arguments + (fixed_width,)))
+                if report is not None:
+                    report(kind + " differs at " + repr(arguments + (fixed_width,)))
+    return failures
+
+def fuzz_batch(iterations, seed=0, report=print):
+    # batch_rule, with and without canonical, against iter_rule one sample
+    # at a time
+    generator = random.Random(seed)
+    failures = []
+    for i in range(iterations):
+        cell_number = generator.randint(1, 16)
+        batch = generator.randint(1, 6)
+        initial_configs = [''.join(generator.choice('01') for j in range(cell_number)) for k in range(batch)]
+        rule_nums = [generator.randrange(256) for k in range(batch)]
+        generations = generator.randint(0, 40)
+        wrap_width = None
+        if generator.random() < 0.5:
+            wrap_width = cell_number + 2*generator.randint(-((cell_number - 1) // 2), 20)
+        arguments = (generations, initial_configs, rule_nums, wrap_width)
+
+        for canonical in (True, False):
+            auto_lattice = rulegenerator.batch_rule(generations, initial_configs, rule_nums, wrap_width, canonical=canonical)
+            for k in range(batch):
+                rows = rulegenerator.iter_rule(initial_configs[k], rule_nums[k], wrap_width=wrap_width, generations=generations)
+                if len(auto_lattice[k]) != generations or [list(row) for row in auto_lattice[k]] != [list(row) for row in rows]:
+                    failures.append(('batch_rule', arguments + (canonical,)))
+                    if report is not None:
+                        report("batch_rule differs at " + repr(arguments + (canonical,)))
+                    break
+    return failures
+
+def fuzz_states(iterations, seed=0, report=print):
+    # rulehashlife.iter_states against the rows of iter_rule, with node
+    # limits down to ones the pattern alone outgrows
+    import rulehashlife
+    generator = random.Random(seed)
+    failures = []
+    for i in range(iterations):
+        initial_config = ''.join(generator.choice('01') for j in range(generator.randint(1, 24)))
+        rule_num = generator.randrange(256)
+        generations = sorted(generator.sample(range(200), 3))
+        max_nodes = generator.choice([50, 200, 1000, 2**20])
+
+        expected = {}
+        for n, row in enumerate(rulegenerator.iter_rule(initial_config, rule_num)):
+            if n in generations:
+                expected[n] = list(row)
+            if n == generations[-1]:
+                break
+        states = rulehashlife.iter_states(initial_config, rule_num, generations, max_nodes=max_nodes)
+        for n, row in zip(generations, states):
+            if list(row) != expected[n]:
+                failures.append(('state_at', (n, initial_config, rule_num, max_nodes)))
+                if report is not None:
+                    report("state_at differs at " + repr((n, initial_config, rule_num, max_nodes)))
+                break
+    return failures
+
+def split_list(arg, convert=str):
+    return [convert(x) for x in arg.split(',') if x != '']
+
+def main(argv):
+    path = GOLDEN_PATH
+    recording = False
+    backends = None
+    rules = range(256)
+    iterations = 200
+    seed = 0
+    try:
+        opts, args = getopt.getopt(argv[1:], "hg:", ["record", "backends=", "rules=", "fuzz=", "seed="])
+    except getopt.GetoptError:
+        print("Type " + argv[0] + " -h for help")
+        return 2
+    try:
+        for opt, arg in opts:
+            if opt == '-h':
+                print("Usage: " + argv[0] + " [-g <golden file>] [--record] [--backends <list>] [--rules <list>] [--fuzz <iterations>] [--seed <seed>]\n")
+                print("--record: Record the golden file from the original engines instead of checking against it.")
+                print("--backends: The backends to check, separated by commas. Backends: " + ','.join(sorted(BACKENDS)) + ".")
+                print("--rules: The rules to check, separated by commas. Defaults to all of them.")
+                print("--fuzz: The number of random cases to compare against the original engines afterwards, and to check fix_width, the command line's rows, batch_rule and state_at on. Defaults to 200.")
+                return 0
+            elif opt == '-g':
+                path = arg
+            elif opt == '--record':
+                recording = True
+            elif opt == '--backends':
+                backends = split_list(arg)
+                for backend in backends:
+                    if backend not in BACKENDS:
+                        print("Unknown backend: " + backend)
+                        return 2
+            elif opt == '--rules':
+                rules = split_list(arg, int)
+            elif opt == '--fuzz':
+                iterations = int(arg)
+            elif opt == '--seed':
+                seed = int(arg)
+    except ValueError:
+        print("Entered number is not a valid integer.")
+        return 2
+
+    if recording:
+        record(path, rules)
+        return 0
+
+    failures = (check(backends, rules, path) + fuzz(iterations, seed, backends) + fuzz_fix_width(iterations, seed) +
+                fuzz_fixed_rows(iterations, seed) + fuzz_batch(iterations, seed) + fuzz_states(iterations, seed))
+    if failures:
+        print(str(len(failures)) + " differences found.")
+        return 1
+    print("All backends match the reference engines.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
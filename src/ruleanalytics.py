@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+from array import array
+
+import rulegenerator
+
+# Statistics of a simulation gathered one generation at a time as it is
+# evolved, so that the grid itself never has to be kept. RowAnalytics takes
+# the generations one by one; analyse_rows feeds it a stream of rows, such as
+# iter_rule with history=False, and analyse_rule a simulation
+
+MAX_BLOCK_SIZE = 16
+
+class RowAnalytics(object):
+
+    # for every generation: the density of 1 cells, the Shannon entropy (in
+    # bits) of its blocks of block_size cells and the earliest generation it
+    # repeats (-1 if none), found from the hashes of the rows. Across
+    # generations: the autocorrelation of the columns over 0 to `lags`
+    # generations, which needs every row to be the same width and keeps the
+    # last `lags` rows. Wrapped rows also count the blocks around their seam
+
+    def __init__(self, block_size=3, lags=16, wrapped=False):
+        import numpy as np
+
+        if block_size < 1 or block_size > MAX_BLOCK_SIZE:
+            raise ValueError("The block size must be between 1 and " + str(MAX_BLOCK_SIZE) + ".")
+        if lags < 0:
+            raise ValueError("The number of lags cannot be negative.")
+        self.block_size = block_size
+        self.lags = lags
+        self.wrapped = wrapped
+
+        self.densities = array('d')
+        self.entropies = array('d')
+        self.repeats = array('q')
+        self.first_seen = {}
+        self.transient = None
+        self.period = 0
+
+        self.width = None
+        self.ones = 0
+        self.cells = 0
+        self.products = np.zeros(lags + 1)
+        self.pairs = np.zeros(lags + 1)
+        self.recent = None
+        self.codes = None
+        self.shifted = None
+
+    def __len__(self):
+        return len(self.densities)
+
+    def add(self, row):
+        # row is only read, so it may be a buffer iter_rule reuses
+        import numpy as np
+
+        row = np.asarray(row, dtype=np.uint8)
+        generation = len(self.densities)
+        width = len(row)
+        if self.width is None:
+            self.start(width)
+        elif width != self.width and self.lags > 0:
+            raise ValueError("The autocorrelation needs every generation to be " + str(self.width) + " cells wide.")
+
+        ones = int(np.count_nonzero(row))
+        self.densities.append(ones / width if width > 0 else 0.0)
+        self.entropies.append(self.block_entropy(row))
+
+        # like rulegenerator.find_cycle, but without the rows to rule out
+        # a collision of the hashes
+        earlier = self.first_seen.setdefault(hash(row.tobytes()), generation)
+        if earlier == generation:
+            self.repeats.append(-1)
+        else:
+            self.repeats.append(earlier)
+            if self.transient is None:
+                self.transient = earlier
+                self.period = generation - earlier
+
+        if self.lags > 0:
+            # row against each of the last `lags` rows at once; generation g
+            # is kept in row g % lags of the ring
+            cells = row.astype(np.float32)
+            known = min(generation, self.lags)
+            if known > 0:
+                products = self.recent @ cells
+                slots = np.arange(known)
+                lags = (generation - 1 - slots) % self.lags + 1
+                self.products[lags] += products[slots]
+                self.pairs[lags] += width
+            self.recent[generation % self.lags] = cells
+        self.products[0] += ones
+        self.pairs[0] += width
+        self.ones += ones
+        self.cells += width
+
+    def start(self, width):
+        import numpy as np
+
+        self.width = width
+        if self.lags > 0:
+            self.recent = np.zeros((self.lags, width), dtype=np.float32)
+
+    def block_entropy(self, row):
+        import numpy as np
+
+        size = self.block_size
+        if self.wrapped and len(row) > 0:
+            ring = np.concatenate((row, row[:size - 1]))
+            blocks = len(row)
+        else:
+            ring = row
+            blocks = len(row) - size + 1
+        if blocks <= 0:
+            return 0.0
+
+        if self.codes is None or len(self.codes) != blocks:
+            self.codes = np.empty(blocks, dtype=np.uint32)
+            self.shifted = np.empty(blocks, dtype=np.uint32)
+        codes = self.codes
+        codes[:] = ring[:blocks]
+        for j in range(1, size):
+            np.left_shift(ring[j:j + blocks], j, out=self.shifted, dtype=np.uint32)
+            codes |= self.shifted
+
+        counts = np.bincount(codes, minlength=1 << size)
+        p = counts[counts > 0] / blocks
+        return float(-(p * np.log2(p)).sum())
+
+    def autocorrelation(self):
+        # the correlation of a cell with the cell of its column `lag`
+        # generations later, for every lag up to self.lags; NaN where there
+        # are no pairs of rows that far apart or every cell is the same
+        import numpy as np
+
+        result = np.full(self.lags + 1, np.nan)
+        if self.cells == 0:
+            return result
+        mean = self.ones / self.cells
+        variance = mean - mean * mean
+        if variance <= 0:
+            return result
+        counted = self.pairs > 0
+        result[counted] = (self.products[counted] / self.pairs[counted] - mean * mean) / variance
+        return result
+
+    def result(self):
+        import numpy as np
+
+        return {'generations': len(self.densities), 'width': self.width,
+                'density': np.frombuffer(self.densities, dtype=np.float64).copy(),
+                'entropy': np.frombuffer(self.entropies, dtype=np.float64).copy(),
+                'repeats': np.frombuffer(self.repeats, dtype=np.int64).copy(),
+                'autocorrelation': self.autocorrelation(),
+                'transient': len(self.densities) if self.transient is None else self.transient,
+                'period': self.period}
+
+def analyse_rows(rows, block_size=3, lags=16, wrapped=False):
+    analytics = RowAnalytics(block_size, lags, wrapped)
+    for row in rows:
+        analytics.add(row)
+    return analytics.result()
+
+def analyse_rule(generations, initial_config, rule_num, wrap_width=None, width=None, block_size=3, lags=16):
+    # the statistics of a simulation, taken from its rows as they are evolved
+    # into the buffers of iter_rule; unbounded rows are padded to `width` or
+    # the widest generation, like iter_rule does
+    rows = rulegenerator.iter_rule(initial_config, rule_num, wrap_width=wrap_width, generations=generations,
+                                   width=width, history=False)
+    return analyse_rows(rows, block_size, lags, wrap_width is not None)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+import hashlib, os
+
+import rulegenerator
+
+class RuleCache(object):
+
+    # keeps the grids of generate_rule and generate_rule_wrap, keyed by rule,
+    # initial configuration and wrap width, with rules that mirror or
+    # complement each other sharing their grids. A request for fewer
+    # generations than a kept grid is a slice of it, one for more continues
+    # it from its last generation. The least recently used grids are dropped
+    # (or moved to `directory`) once they take up more than max_bytes
+
+    def __init__(self, max_bytes=256*2**20, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.bytes_used = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.resumes = 0
+        self.misses = 0
+
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def generate_rule(self, generations, initial_config, rule_num):
+        if generations < 1:
+            return rulegenerator.generate_rule(generations, initial_config, rule_num, backend='numpy')
+        return self.lookup(generations, initial_config, rule_num, None)
+
+    def generate_rule_wrap(self, generations, initial_config, rule_num, wrap_width):
+        if generations < 1 or not rulegenerator.wrap_supported(initial_config, wrap_width):
+            return rulegenerator.generate_rule_wrap(generations, initial_config, rule_num, wrap_width, backend='numpy')
+        return self.lookup(generations, initial_config, rule_num, wrap_width)
+
+    def lookup(self, generations, initial_config, rule_num, wrap_width):
+        # equivalent rules share one grid, see rulegenerator.canonicalize
+        rule_num, initial_config, mirrored, complemented = rulegenerator.canonicalize(rule_num, initial_config, wrap_width)
+        cells = ''.join(str(x) for x in rulegenerator.initial_cells(initial_config))
+        key = (rule_num, cells, wrap_width)
+
+        # every request counts once: as a miss, as a continued grid, or as a
+        # hit on a grid kept in memory or read back from disk
+        in_memory = key in self.entries
+        auto_lattice = self.get(key)
+        if auto_lattice is None:
+            self.misses += 1
+            if wrap_width is None:
+                auto_lattice = rulegenerator.vectorized_rules(generations, initial_config, rule_num)
+            else:
+                auto_lattice = rulegenerator.vectorized_rules_wrap(generations, initial_config, rule_num, wrap_width)
+            self.put(key, auto_lattice)
+        elif len(auto_lattice) >= generations:
+            if in_memory:
+                self.hits += 1
+            else:
+                self.disk_hits += 1
+            auto_lattice = rulegenerator.resume_rule(auto_lattice, generations, initial_config, rule_num, wrap_width)
+        else:
+            self.resumes += 1
+            auto_lattice = rulegenerator.resume_rule(auto_lattice, generations, initial_config, rule_num, wrap_width)
+            self.put(key, auto_lattice)
+
+        return rulegenerator.Lattice(rulegenerator.transform_lattice(auto_lattice, mirrored, complemented))
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        if self.directory is not None:
+            path = self.disk_path(key)
+            if os.path.exists(path):
+                import numpy as np
+                auto_lattice = np.load(path)
+                self.put(key, auto_lattice)
+                return auto_lattice
+
+        return None
+
+    def put(self, key, auto_lattice):
+        # the grids handed out share the kept ones, so they are read-only
+        auto_lattice.flags.writeable = False
+        if key in self.entries:
+            self.bytes_used -= self.entries.pop(key).nbytes
+        self.entries[key] = auto_lattice
+        self.bytes_used += auto_lattice.nbytes
+
+        while self.bytes_used > self.max_bytes and len(self.entries) > 1:
+            old_key, old_lattice = self.entries.popitem(last=False)
+            self.bytes_used -= old_lattice.nbytes
+            if self.directory is not None:
+                self.save(old_key, old_lattice)
+
+    def save(self, key, auto_lattice):
+        import numpy as np
+        path = self.disk_path(key)
+        # keep the longest grid of a key on disk
+        if os.path.exists(path) and len(np.load(path, mmap_mode='r')) >= len(auto_lattice):
+            return
+        np.save(path, auto_lattice)
+
+    def disk_path(self, key):
+        name = hashlib.sha1(repr(key).encode('ascii')).hexdigest()
+        return os.path.join(self.directory, name + '.npy')
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes_used = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'resumes': self.resumes,
+                'misses': self.misses, 'bytes_used': self.bytes_used, 'entries': len(self.entries)}
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
-from collections import deque
+from collections import OrderedDict, deque
 import sys, getopt
+import struct, zlib
+import copy, itertools, os, time
 
 def main(argv):
     
@@ -13,57 +15,103 @@ def main(argv):
     wrapped_b = False
     fixed_w = None
     wrapped_w = None
+    job_file = None
+    workers = None
+    profile = None
     user_input_error = False
     try:
-        opts, args = getopt.getopt(argv[1:],"hi:r:o:g:",["fixedwidth=","wrapped="])
+        opts, args = getopt.getopt(argv[1:],"hi:r:o:g:",["fixedwidth=","wrapped=","jobs=","workers=","profile"])
     except getopt.GetoptError:
         print("Type " + argv[0] + " -h for help")
-        return
+        return 1
     for opt, arg in opts:
         if opt == '-h':
             print('\n')
             print(argv[0] + " will take an initial configuration for an elementary cellular automata, evolve it according to the given rule, and output the resultant simulation as an image.\n")
-            print("Usage: " + argv[0] + " -i <initial configuration> -r <desired rule as an integer> -g <number of generations to compute> -o <name and path for output image> [--fixedwidth <width> --wrapped <width>]\n")
+            print("Usage: " + argv[0] + " -i <initial configuration> -r <desired rule as an integer> -g <number of generations to compute> -o <name and path for output image> [--fixedwidth <width> --wrapped <width> --profile]\n")
+            print("   or: " + argv[0] + " --jobs <job file> [--workers <number of processes>]\n")
             print("-i: The initial configuration (generation 0) of the automata as a binary number. Must have odd length or will be extended.")
             print("-r: The rule for the cellular automata evolution as an integer from 0 to 255.")
             print("-g: Number of generations to evolve the automata. This will specify the height (in pixels) of the output image.")
             print("-o: Specify the name and location of the output image.")
             print("--fixedwidth: Force the output image to have the specified width (in pixels). The width must be an odd-numbered integer. If it is not odd it will be rounded up to the next odd number.")
             print("--wrapped: Make the grid have the specified width (in pixels) and wrap around instead of being infinite. The width must be an odd-numbered integer or it will be rounded up to the next odd number. Will override --fixedwidth.")
+            print("--profile: After writing the image, report the time spent on each phase, the cells computed per second, the widest generation and the bytes allocated.")
+            print("--jobs: Render the images of every line of the given file in parallel. Each line holds the arguments above for one image.")
+            print("--workers: The number of processes rendering the images of --jobs. Defaults to the number of processors.")
             print('\n')
-            return
+            return 0
         elif opt == '-i':
             if arg is None or arg == '':
                 print("Missing initial configuration.")
-                return
+                return 1
             init_conf = arg
         elif opt == '-r':
             if arg is None or arg == '':
                 print("Missing rule.")
-                return
+                return 1
             rule_num = arg
         elif opt == '-o':
             if arg is None or arg == '':
                 print("Missing output image location.")
-                return
+                return 1
             save_image = arg
         elif opt == '-g':
             if arg is None or arg == '':
                 print("Missing number of generations.")
-                return
+                return 1
             gen_num = arg
         elif opt == '--fixedwidth':
             if arg is None or arg == '':
                 print("Missing fixed width.")
-                return
+                return 1
             fixed_b = True
             fixed_w = arg
         elif opt == '--wrapped':
             if arg is None or arg == '':
                 print("Missing grid width.")
-                return
+                return 1
             wrapped_b = True
             wrapped_w = arg
+        elif opt == '--jobs':
+            if arg is None or arg == '':
+                print("Missing job file.")
+                return 1
+            job_file = arg
+        elif opt == '--workers':
+            if arg is None or arg == '':
+                print("Missing number of processes.")
+                return 1
+            workers = arg
+        elif opt == '--profile':
+            profile = Profile()
+
+    if job_file is not None:
+        if workers is not None:
+            try:
+                workers = int(workers)
+            except ValueError as ve:
+                print("Entered number of processes is not a valid integer.")
+                return 1
+            if workers < 1:
+                print("The number of processes must be at least 1.")
+                return 1
+        import ruleparallel
+        try:
+            jobs = ruleparallel.read_jobs(job_file)
+        except IOError:
+            print("Failed to read job file: ")
+            print(job_file)
+            return 1
+        failed = ruleparallel.render_jobs(jobs, workers=workers,
+                                          progress=lambda done, total: print("Finished " + str(done) + " of " + str(total) + " jobs."))
+        print("Rendered " + str(len(jobs) - len(failed)) + " of " + str(len(jobs)) + " images.")
+        if failed:
+            print("Failed to render " + str(len(failed)) + " images, from the job lines:")
+            for line in failed:
+                print(line)
+            return 1
+        return 0
             
     if init_conf is None:
         print("Specify initial configuration.")
@@ -82,7 +130,7 @@ def main(argv):
         user_input_error = True
         
     if user_input_error:
-        return
+        return 1
     
     result_grid = None
     
@@ -91,21 +139,21 @@ def main(argv):
         rule_num = int(rule_num)
     except ValueError as ve:
         print("Entered rule is not a valid integer.")
-        return
+        return 1
         
     try:
         gen_num = int(gen_num)
     except ValueError as ve:
         print("Entered generation is not a valid integer.")
-        return
+        return 1
     
     if rule_num < 0 or rule_num > 255:
         print("Entered rule is out of valid range (0-255).")
-        return
+        return 1
     
     if len(init_conf) < 3:
         print("The initial configuration must contain at least 3 cells.")
-        return
+        return 1
     
     if len(init_conf) % 2 == 0:
         init_conf += '0'
@@ -113,76 +161,422 @@ def main(argv):
     for i in range(len(init_conf)):
         if init_conf[i] != '0' and init_conf[i] != '1':
             print("The initial configuration may only contain 0 or 1 as characters.")
-            return
+            return 1
             
       
         
     
-    if not wrapped_b:
-        result_grid = generate_rule(gen_num, init_conf, rule_num)
-    else:
+    if gen_num < 1:
+        print("The number of generations must be at least 1.")
+        return 1
+
+    if wrapped_b:
         try:
             wrapped_w = int(wrapped_w)
         except ValueError as ve:
             print("Entered wrap width is not a valid integer.")
-            return
+            return 1
+        if wrapped_w < 1:
+            print("The wrap width must be at least 1.")
+            return 1
         if wrapped_w % 2 == 0:
             wrapped_w += 1
-        result_grid = generate_rule_wrap(gen_num, init_conf, rule_num, wrapped_w)
-        
+
     if fixed_b and not wrapped_b:
         try:
             fixed_w = int(fixed_w)
         except ValueError as ve:
             print("Entered fixed width is not a valid integer.")
-            return
+            return 1
+        if fixed_w < 1:
+            print("The fixed width must be at least 1.")
+            return 1
         if fixed_w % 2 == 0:
             fixed_w += 1
-        
-        fix_width(result_grid, fixed_w)
+
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+    if numpy is not None:
+        # stream the generations straight into the image, one row at a time
+        if profile is not None:
+            profile.lap()
+        if wrapped_b:
+            rows = iter_rule(init_conf, rule_num, wrap_width=wrapped_w, generations=gen_num, history=False)
+        else:
+            if fixed_b:
+                # only the cells the fixed width depends on are evolved
+                width = fixed_w
+                offset = fixed_width_offset(gen_num, init_conf, rule_num, fixed_w)
+            else:
+                width = rule_width(gen_num, init_conf, rule_num)
+                offset = None
+            if profile is not None:
+                profile.lap('measure')
+            rows = iter_rule(init_conf, rule_num, generations=gen_num, width=width, history=False, offset=offset)
+        try:
+            stream_image(rows, save_image, profile=profile)
+        except IOError:
+            print("Failed to write to file: ")
+            print(save_image)
+            return 1
+        if profile is not None:
+            print(profile.report())
+        return 0
+
+    if wrapped_b:
+        result_grid = generate_rule_wrap(gen_num, init_conf, rule_num, wrapped_w, profile=profile)
+    elif fixed_b:
+        # the grid of generate_rule cropped or padded by fix_width
+        if profile is not None:
+            profile.start()
+        result_grid = fixed_width_rules(gen_num, init_conf, rule_num, fixed_w)
+        if profile is not None:
+            profile.lap('evolve')
+            profile.finish(result_grid)
+    else:
+        result_grid = generate_rule(gen_num, init_conf, rule_num, profile=profile)
+
     try:                
-        to_image(result_grid, save_image)
+        to_image(result_grid, save_image, profile=profile)
     except ImportError:
         print("Missing required library Pillow (PIL).")
-        return
+        return 1
     except IOError:
         print("Failed to write to file: ")
         print(save_image)
-        return
-    
-def fix_width(grid, width):
+        return 1
+    if profile is not None:
+        print(profile.report())
+    return 0
+
+def fix_width(grid, width, background=None, in_place=True):
+    # crops every generation of grid to its centre `width` cells, or pads it
+    # out to `width` with the background cell of that generation: background
+    # is one cell for all generations, a list of one cell per generation (see
+    # background_cells) or None for the outermost cell of each generation.
+    # Unless in_place is False, grid itself is changed
     if width % 2 == 0:
         width += 1
-        
-    result_grid_gen = len(grid)
-    result_grid_w = len(grid[0])
-    for i in range(result_grid_gen):
+
+    if isinstance(grid, (Lattice, CycleLattice, LazyLattice)):
+        if not in_place:
+            grid = copy.copy(grid)
+        if grid.width > width:
+            removes = int((grid.width - width)/2)
+            grid.crop(removes, removes + width)
+        elif grid.width < width and isinstance(grid, LazyLattice):
+            # a LazyLattice knows its own background
+            adds = int((width - grid.width)/2)
+            grid.crop(-adds, width - adds)
+        elif grid.width < width:
+            import numpy as np
+            if isinstance(grid, CycleLattice) and not (background is None or isinstance(background, int)):
+                # a replayed row can have another background than the row it
+                # repeats, and then every generation has to be kept
+                fills = np.asarray(background[:len(grid)], dtype=np.uint8)
+                if (fills != fills[grid.row_indices()]).any():
+                    grid.data = grid[:].data
+                    grid.transient = len(grid)
+                    grid.period = 0
+            cells = np.asarray(Lattice(grid.data, grid.width, grid.packed, grid.offset))
+            padded = np.empty((len(cells), width), dtype=np.uint8)
+            padded[:] = row_fills(cells, background)[:, None]
+            adds = int((width - grid.width)/2)
+            padded[:, adds:adds + grid.width] = cells
+            grid.data = pack_cells(padded) if grid.packed else padded
+            grid.offset = 0
+            grid.width = width
+        return grid
+
+    if not in_place:
+        grid = list(grid)
+    for i in range(len(grid)):
         result_grid_w = len(grid[i])
         if result_grid_w > width:
             removes = int((result_grid_w - width)/2)
-            for j in range(removes):
-                grid[i].pop()
-                grid[i].popleft()
-            else:
-                adds = int((width - result_grid_w)/2)
-                for j in range(adds):
-                    left_ext = grid[i][0]
-                    right_ext = grid[i][-1]
-                    grid[i].append(left_ext)
-                    grid[i].appendleft(right_ext)
+            grid[i] = deque(itertools.islice(grid[i], removes, removes + width))
+        elif result_grid_w < width:
+            adds = int((width - result_grid_w)/2)
+            fill = row_fill(grid[i], background, i)
+            row = deque([fill]*adds)
+            row.extend(grid[i])
+            row.extend([fill]*(width - result_grid_w - adds))
+            grid[i] = row
+        elif not in_place:
+            grid[i] = deque(grid[i])
     return grid
 
+def row_fill(row, background, i):
+    if background is None:
+        return row[0]
+    if isinstance(background, int):
+        return background
+    return background[i]
 
-def to_image(grid, path):
+def row_fills(cells, background):
+    # row_fill for every row of a 2-D array at once
+    import numpy as np
+    if background is None:
+        return cells[:, 0]
+    if isinstance(background, int):
+        return np.full(len(cells), background, dtype=np.uint8)
+    return np.asarray(background, dtype=np.uint8)[:len(cells)]
+
+def fix_rows(rows, width, background=None):
+    # fix_width one generation at a time, for rows on their way from
+    # iter_rule to stream_image
+    import numpy as np
+    if width % 2 == 0:
+        width += 1
+    for i, row in enumerate(rows):
+        yield pad_row(np.asarray(row, dtype=np.uint8), width, row_fill(row, background, i))
+
+def to_image(grid, path, profile=None):
+    if isinstance(grid, Lattice) and grid.packed or isinstance(grid, LazyLattice):
+        # rendered one row at a time straight from the packed words, or as
+        # the generations are computed
+        stream_image(grid, path, profile=profile)
+        return
+
+    if profile is not None:
+        profile.lap()
     from PIL import Image
+    if isinstance(grid, Lattice):
+        import numpy as np
+        # mode '1' stores 8 pixels per byte, most significant bit first,
+        # with a set bit for a white pixel
+        white = np.packbits(np.asarray(grid) == 0, axis=1)
+        auto_image = Image.frombytes('1', (grid.width, len(grid)), white.tobytes())
+        if profile is not None:
+            profile.lap('pack')
+        auto_image.save(path, 'PNG')
+        if profile is not None:
+            profile.lap('encode')
+        return
     alwidth = len(grid[-1])
     gens = len(grid)
     al = [255 if x == 0 else 0 for y in grid for x in y ]
     auto_image = Image.new('1', (alwidth,gens))
     auto_image.putdata(al)
     auto_image.convert('RGB')
+    if profile is not None:
+        profile.lap('pack')
     auto_image.save(path, 'PNG')
-        
+    if profile is not None:
+        profile.lap('encode')
+
+class Profile(object):
+
+    # what generate_rule, generate_rule_wrap, to_image and stream_image
+    # spend their time on, collected when one is passed to them as
+    # `profile`. Each phase is timed from the end of the phase before it;
+    # callback, if given, is called as callback(phase, seconds) every time a
+    # phase ends. bytes_allocated is the size of the grids and rows made, or
+    # with trace_memory the peak traced by tracemalloc while simulating
+
+    SIMULATION_PHASES = ('measure', 'decode', 'allocate', 'evolve', 'copy')
+
+    def __init__(self, callback=None, trace_memory=False):
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.seconds = {}
+        self.calls = {}
+        self.cells = 0
+        self.peak_width = 0
+        self.bytes_allocated = 0
+        self.last = time.perf_counter()
+        self.tracing = False
+
+    def lap(self, phase=None):
+        now = time.perf_counter()
+        if phase is not None:
+            seconds = now - self.last
+            self.seconds[phase] = self.seconds.get(phase, 0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + 1
+            if self.callback is not None:
+                self.callback(phase, seconds)
+        self.last = now
+
+    def count(self, generations, width, nbytes=0):
+        self.cells += generations * width
+        self.peak_width = max(self.peak_width, width)
+        self.bytes_allocated += nbytes
+
+    def start(self):
+        if self.trace_memory:
+            import tracemalloc
+            self.tracing = not tracemalloc.is_tracing()
+            if self.tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        self.lap()
+
+    def finish(self, grid):
+        # counts a grid just simulated
+        if self.trace_memory:
+            import tracemalloc
+            nbytes = tracemalloc.get_traced_memory()[1]
+            if self.tracing:
+                tracemalloc.stop()
+        else:
+            nbytes = grid_bytes(grid)
+        if isinstance(grid, LazyLattice):
+            # nothing is simulated until its rows are asked for
+            self.count(0, grid.width, nbytes)
+        elif len(grid) > 0:
+            self.count(len(grid), grid.width if isinstance(grid, Lattice) else len(grid[0]), nbytes)
+
+    def cells_per_second(self):
+        seconds = sum(self.seconds.get(phase, 0) for phase in self.SIMULATION_PHASES)
+        if seconds == 0:
+            return None
+        return self.cells / seconds
+
+    def as_dict(self):
+        return {'seconds': dict(self.seconds), 'calls': dict(self.calls), 'cells': self.cells,
+                'cells_per_second': self.cells_per_second(), 'peak_width': self.peak_width,
+                'bytes_allocated': self.bytes_allocated}
+
+    def report(self):
+        total = sum(self.seconds.values())
+        lines = ['%-10s %10s %7s %9s' % ('phase', 'seconds', 'share', 'calls')]
+        for phase in self.seconds:
+            share = 100.0 * self.seconds[phase] / total if total > 0 else 0.0
+            lines.append('%-10s %10.4f %6.1f%% %9d' % (phase, self.seconds[phase], share, self.calls[phase]))
+        lines.append('%-10s %10.4f' % ('total', total))
+        rate = self.cells_per_second()
+        lines.append('cells updated: ' + str(self.cells) + ('' if rate is None else ' (%.0f cells per second)' % rate))
+        lines.append('peak row width: ' + str(self.peak_width) + ' cells')
+        lines.append('bytes allocated: ' + str(self.bytes_allocated))
+        return '\n'.join(lines)
+
+def grid_bytes(grid):
+    if isinstance(grid, Lattice):
+        return grid.data.nbytes
+    if isinstance(grid, LazyLattice):
+        return sum(row.nbytes for row, fill_cell in grid.checkpoints.values())
+    return sys.getsizeof(grid) + sum(sys.getsizeof(row) for row in grid)
+
+class PNGWriter(object):
+
+    # writes a 1-bit greyscale PNG one row at a time; the height in the
+    # header is filled in when the writer is closed. An image without
+    # pixels raises ValueError, and a file left unfinished is removed
+
+    SIGNATURE = b'\x89PNG\r\n\x1a\n'
+    IDAT_SIZE = 1 << 16
+
+    def __init__(self, path, width=None):
+        if width is not None and width < 1:
+            raise ValueError("An image must be at least 1 pixel wide.")
+        self.path = path
+        self.file = open(path, 'wb')
+        self.width = width
+        self.height = 0
+        self.compressor = zlib.compressobj()
+        self.pending = []
+        self.pending_size = 0
+        self.file.write(self.SIGNATURE)
+        self.header_position = self.file.tell()
+        self.write_header()
+
+    def write_header(self):
+        header = struct.pack('>IIBBBBB', self.width or 0, self.height, 1, 0, 0, 0, 0)
+        self.write_chunk(b'IHDR', header)
+
+    def write_chunk(self, chunk_type, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(chunk_type)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    def write_row(self, row):
+        if self.width is None:
+            if len(row) < 1:
+                raise ValueError("An image must be at least 1 pixel wide.")
+            self.width = len(row)
+
+        if hasattr(row, 'dtype'):
+            import numpy as np
+            scanline = np.packbits(np.asarray(row) == 0).tobytes()
+        else:
+            # a set bit is a white pixel, most significant bit first
+            bits = ''.join('1' if x == 0 else '0' for x in row)
+            bits += '0' * (-len(bits) % 8)
+            scanline = int(bits, 2).to_bytes(len(bits) // 8, 'big') if bits else b''
+
+        self.height += 1
+        self.pending.append(self.compressor.compress(b'\x00' + scanline))
+        self.pending_size += len(self.pending[-1])
+        if self.pending_size >= self.IDAT_SIZE:
+            self.flush()
+
+    def flush(self):
+        data = b''.join(self.pending)
+        if data:
+            self.write_chunk(b'IDAT', data)
+        self.pending = []
+        self.pending_size = 0
+
+    def close(self):
+        if self.height == 0:
+            self.discard()
+            raise ValueError("An image must be at least 1 pixel high.")
+        self.pending.append(self.compressor.flush())
+        self.flush()
+        self.write_chunk(b'IEND', b'')
+        self.file.seek(self.header_position)
+        self.write_header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def discard(self):
+        self.file.close()
+        os.remove(self.path)
+
+def stream_image(rows, path, width=None, profile=None):
+    if profile is None:
+        with PNGWriter(path, width) as writer:
+            for row in rows:
+                writer.write_row(row)
+        return
+
+    # the time spent waiting for a row is the time spent making it (evolving
+    # it, for iter_rule); the rows of a Lattice were counted when simulated
+    # a row that is a view of a buffer, as with history=False, counts the
+    # buffer the first time one of its views comes by
+    counted = not isinstance(rows, Lattice)
+    phase = 'evolve' if counted else 'unpack'
+    buffers = []
+    profile.lap()
+    with PNGWriter(path, width) as writer:
+        for row in rows:
+            profile.lap(phase)
+            writer.write_row(row)
+            if counted:
+                base = getattr(row, 'base', None)
+                if base is None:
+                    nbytes = getattr(row, 'nbytes', 0)
+                elif any(base is buffer for buffer in buffers):
+                    nbytes = 0
+                else:
+                    nbytes = base.nbytes
+                    buffers = buffers[-1:] + [base]
+                profile.count(1, len(row), nbytes)
+            profile.lap('encode')
+    profile.lap('encode')
+
 def even_rules(generations, initial_config, rule_num):
 
     rule_bin = bin(rule_num)[2:]
@@ -829,19 +1223,1437 @@ def odd_rules_wrap(generations, initial_config, rule_num, wrap_width):
     else:
         return odd_rules_1_wrap(generations, initial_config, rule_num, wrap_width)
     
-def generate_rule(generations, initial_config, rule_num):
-    if rule_num % 2 == 0:
-        return even_rules(generations, initial_config, rule_num)
+# The python engines evolve BLOCK_STEPS generations of BLOCK_CELLS cells at
+# a time, by looking up the window of cells they depend on in a BlockTable.
+# The tables of the BLOCK_TABLES_KEPT rules used last are kept
+BLOCK_STEPS = 4
+BLOCK_CELLS = 4
+BLOCK_TABLES_KEPT = 16
+
+class BlockTable(dict):
+
+    # maps a window of 2*steps + cells cells, as bytes, to the `cells` cells
+    # in its middle 1 to `steps` generations later, as one bytes object with
+    # cell j of generation i + 1 at j*steps + i. The windows are only evolved
+    # the first time they are looked up
+
+    def __init__(self, rule_num, steps=BLOCK_STEPS, cells=BLOCK_CELLS):
+        self.rule_table = decode_rule(rule_num)
+        self.steps = steps
+        self.cells = cells
+
+    def __missing__(self, window):
+        rule_little_endian = self.rule_table
+        row = window
+        rows = []
+        for i in range(self.steps):
+            row = bytes([rule_little_endian[4*l + 2*c + r] for l, c, r in zip(row, row[1:], row[2:])])
+            adds = self.steps - 1 - i
+            rows.append(row[adds:adds + self.cells])
+        result = bytes([cells[j] for j in range(self.cells) for cells in rows])
+        self[window] = result
+        return result
+
+block_tables = OrderedDict()
+
+def block_table(rule_num, steps=BLOCK_STEPS, cells=BLOCK_CELLS):
+    key = (rule_num, steps, cells)
+    if key in block_tables:
+        block_tables.move_to_end(key)
+        return block_tables[key]
+    table = block_tables[key] = BlockTable(rule_num, steps, cells)
+    while len(block_tables) > BLOCK_TABLES_KEPT:
+        block_tables.popitem(last=False)
+    return table
+
+def block_span(table, length):
+    # the cells evolve_block needs for `length` cells: whole blocks of them
+    # and table.steps more on either side
+    return -(-length // table.cells) * table.cells + 2*table.steps
+
+def evolve_block(table, row, length):
+    # the `length` cells that start table.steps cells into row, 1 to
+    # table.steps generations later; row has to be block_span cells long
+    # the blocks side by side hold generation i + 1 in every steps-th cell
+    # from cell i on
+    window = 2*table.steps + table.cells
+    blocks = b''.join([table[row[x:x + window]] for x in range(0, length, table.cells)])
+    return [blocks[i::table.steps][:length] for i in range(table.steps)]
+
+def light_cone_rules(generations, initial_config, rule_num, profile=None):
+
+    table = block_table(rule_num)
+    steps = table.steps
+    cells = initial_cells(initial_config)
+    cell_number = len(cells)
+
+    if generations < 1:
+        if rule_num % 2 == 0:
+            return []
+        generations = 1
+
+    background = background_cells(generations, rule_num)
+    if profile is not None:
+        profile.lap('decode')
+
+    # every row is as wide as the deque engines can pad to, three cells past
+    # the light cone on each side, and only the light cone is ever evolved
+    total_width = light_cone_width(initial_config, generations) + 6
+    margin = (total_width - cell_number) // 2
+
+    auto_lattice = [bytes([background[0]]) * margin + bytes(cells) + bytes([background[0]]) * (total_width - margin - cell_number)]
+    if profile is not None:
+        profile.lap('allocate')
+
+    # only the cells lo to hi differ from the background, so only the cells
+    # they can reach in `steps` generations are evolved
+    lo, hi = active_span(auto_lattice[0], margin, margin + cell_number, background[0])
+
+    while len(auto_lattice) < generations:
+        i = len(auto_lattice) - 1
+        row = auto_lattice[i]
+        if lo >= hi:
+            auto_lattice.extend([bytes([bg]) * total_width for bg in background[i + 1:i + 1 + steps]])
+            continue
+        start = max(lo - steps, 0)
+        stop = min(hi + steps, total_width)
+        fill = bytes([background[i]])
+        first = start - steps
+        last = first + block_span(table, stop - start)
+        window = fill * max(-first, 0) + row[max(first, 0):last] + fill * max(last - total_width, 0)
+
+        for j, middle in enumerate(evolve_block(table, window, stop - start)[:generations - 1 - i]):
+            fill = bytes([background[i + 1 + j]])
+            auto_lattice.append(fill * start + middle + fill * (total_width - stop))
+        lo, hi = active_span(auto_lattice[-1], start, stop, background[len(auto_lattice) - 1])
+    if profile is not None:
+        profile.lap('evolve')
+
+    # the grid is cropped to the widest generation of the deque engines,
+    # which grow by two cells per side whenever the pattern reaches one of
+    # the two outermost cells
+    left = margin
+    length = cell_number
+    for i in range(generations):
+        row = auto_lattice[i]
+        bg = background[i]
+        if (row[left] != bg or row[left + 1] != bg or
+                row[left + length - 1] != bg or row[left + length - 2] != bg):
+            left -= 2
+            length += 4
+
+    for i in range(generations):
+        auto_lattice[i] = deque(auto_lattice[i][left:left + length])
+    if profile is not None:
+        profile.lap('copy')
+
+    return auto_lattice
+
+def fixed_width_offset(generations, initial_config, rule_num, width):
+    # the cell, counted from the first cell of the initial configuration,
+    # that fix_width crops or pads the grid of generate_rule to start at.
+    # Its rounding is different when it crops than when it pads, which only
+    # matters when the initial configuration is an even number of cells
+    cell_number = len(initial_cells(initial_config))
+    if cell_number >= width or (width - cell_number) % 2 == 0:
+        return (cell_number - width) // 2
+    if light_cone_width(initial_config, generations) + 6 < width:
+        return -((width - cell_number) // 2)
+    if rule_width(generations, initial_config, rule_num) > width:
+        return (cell_number - width) // 2
+    return -((width - cell_number) // 2)
+
+def cells_between(row, row_start, fill, start, stop):
+    # the cells start to stop of a row of bytes that holds the cells
+    # row_start onwards, with `fill` anywhere else
+    first = min(max(start - row_start, 0), len(row))
+    last = min(max(stop - row_start, 0), len(row))
+    left = max(min(row_start, stop) - start, 0)
+    return fill * left + row[first:last] + fill * (stop - start - left - (last - first))
+
+def fixed_width_rules(generations, initial_config, rule_num, width):
+    # fix_width(generate_rule(...), width, background_cells(...)) from only
+    # the cells the `width` cells kept depend on: generation i only needs
+    # the cells up to generations - 1 - i cells either side of them, and of
+    # those only the ones the pattern can have reached
+
+    if width % 2 == 0:
+        width += 1
+    table = block_table(rule_num)
+    steps = table.steps
+
+    if generations < 1:
+        if rule_num % 2 == 0:
+            return []
+        generations = 1
+
+    background = background_cells(generations, rule_num)
+    offset = fixed_width_offset(generations, initial_config, rule_num, width)
+
+    # row holds the cells row_start onwards of the latest generation, and
+    # lo to hi are the cells of it that differ from the background
+    row = bytes(initial_cells(initial_config))
+    row_start = 0
+    lo, hi = active_span(row, 0, len(row), background[0])
+    auto_lattice = [deque(cells_between(row, row_start, bytes([background[0]]), offset, offset + width))]
+
+    while len(auto_lattice) < generations:
+        i = len(auto_lattice) - 1
+        reach = max(generations - 1 - i - steps, 0)
+        start = max(lo - steps, offset - reach)
+        stop = min(hi + steps, offset + width + reach)
+        if lo >= hi or start >= stop:
+            # the pattern is gone or can no longer reach the cells kept
+            for bg in background[i + 1:i + 1 + steps]:
+                auto_lattice.append(deque([bg] * width))
+            lo = hi
+            continue
+
+        first = start - steps
+        window = cells_between(row, row_start, bytes([background[i]]), first, first + block_span(table, stop - start))
+        rows = evolve_block(table, window, stop - start)[:generations - 1 - i]
+        for j, middle in enumerate(rows):
+            auto_lattice.append(deque(cells_between(middle, start, bytes([background[i + 1 + j]]), offset, offset + width)))
+        row = rows[-1]
+        row_start = start
+        lo, hi = active_span(row, 0, len(row), background[len(auto_lattice) - 1])
+        lo += start
+        hi += start
+
+    return auto_lattice
+
+def torus_rules(generations, initial_config, rule_num, wrap_width, profile=None):
+
+    check_wrap(initial_config, wrap_width)
+
+    table = block_table(rule_num)
+    steps = table.steps
+
+    if generations < 1:
+        if rule_num % 2 == 0:
+            return []
+        generations = 1
+
+    background = background_cells(generations, rule_num)
+    auto_lattice = [bytes(torus_cells(initial_config, wrap_width))]
+    span = block_span(table, wrap_width)
+    if profile is not None:
+        profile.lap('decode')
+
+    # while the cells lo to hi that differ from the background stay clear
+    # of the seam, only the cells they can reach in `steps` generations are
+    # evolved
+    lo, hi = active_span(auto_lattice[0], 0, wrap_width, background[0])
+
+    while len(auto_lattice) < generations:
+        i = len(auto_lattice) - 1
+        row = auto_lattice[i]
+        if lo >= hi:
+            auto_lattice.extend([bytes([bg]) * wrap_width for bg in background[i + 1:i + 1 + steps]])
+            continue
+        if lo >= 2*steps and hi <= wrap_width - 2*steps:
+            start = lo - steps
+            stop = hi + steps
+            last = start - steps + block_span(table, stop - start)
+            window = row[start - steps:last] + bytes([background[i]]) * max(last - wrap_width, 0)
+            for j, middle in enumerate(evolve_block(table, window, stop - start)[:generations - 1 - i]):
+                fill = bytes([background[i + 1 + j]])
+                auto_lattice.append(fill * start + middle + fill * (wrap_width - stop))
+        else:
+            # the row read around the torus from `steps` cells before its first
+            window = (row * (span // wrap_width + 2))[-steps % wrap_width:][:span]
+            auto_lattice.extend(evolve_block(table, window, wrap_width)[:generations - 1 - i])
+            start = 0
+            stop = wrap_width
+        lo, hi = active_span(auto_lattice[-1], start, stop, background[len(auto_lattice) - 1])
+    if profile is not None:
+        profile.lap('evolve')
+
+    for i in range(generations):
+        auto_lattice[i] = deque(auto_lattice[i])
+    if profile is not None:
+        profile.lap('copy')
+
+    return auto_lattice
+
+def decode_rule(rule_num):
+    rule_bin = bin(rule_num)[2:]
+    RULE_BIT_LENGTH = 8
+
+    if len(rule_bin) < RULE_BIT_LENGTH :
+        rule_bin = '0'*(RULE_BIT_LENGTH - len(rule_bin)) + rule_bin
+
+    return [int(x) for x in rule_bin[::-1]]
+
+def initial_cells(initial_config):
+    cells = [int(x) for x in initial_config]
+
+    if len(cells) == 0:
+        cells.append(0)
+
+    if not ( len(cells) > 1 ):
+        cells = [0] + cells + [0]
+
+    return cells
+
+def background_cells(generations, rule_num):
+    # the state of the cells far away from the pattern: 0 at generation 0,
+    # then whatever rule_num makes of three background cells
+    rule_little_endian = decode_rule(rule_num)
+    background = [0]
+    for i in range(1, generations):
+        background.append(rule_little_endian[7*background[-1]])
+    return background
+
+def active_span(row, lo, hi, cell):
+    # narrows the cells lo to hi of row down to those between its first and
+    # last cell that is not `cell`. Spans only grow by a few cells per
+    # generation, so narrowing them back down takes next to no time
+    while lo < hi and row[lo] == cell:
+        lo += 1
+    while hi > lo and row[hi - 1] == cell:
+        hi -= 1
+    return lo, hi
+
+def wrap_supported(initial_config, wrap_width):
+    # the fast engines treat a wrapped grid as a torus of wrap_width cells,
+    # which is only how the deque engines behave when the initial
+    # configuration can be centred exactly on it
+    cell_number = len(initial_cells(initial_config))
+    return wrap_width > 0 and (cell_number - wrap_width) % 2 == 0
+
+def check_wrap(initial_config, wrap_width):
+    # the error of every engine that only handles the widths of wrap_supported
+    if not wrap_supported(initial_config, wrap_width):
+        raise ValueError("The initial configuration cannot be centred on a grid of width " + str(wrap_width) + ".")
+
+def evolve_cells(rule_table, row, out=None, scratch=None):
+    # the cells of row but its first and last one generation on, into out
+    # if given: cell x from cells x - 1 to x + 1 of row. row may be a batch
+    # of rows (the last axis being the cells) with rule_table holding one
+    # rule per row. scratch, two arrays at least as long as the result,
+    # saves allocating them
+    import numpy as np
+    shape = row.shape[:-1] + (row.shape[-1] - 2,)
+    if scratch is None:
+        neighbourhood = np.empty(shape, dtype=np.uint8)
+        centre = np.empty(shape, dtype=np.uint8)
     else:
-        return odd_rules(generations, initial_config, rule_num)
-    
-def generate_rule_wrap(generations, initial_config, rule_num, wrap_width):
+        neighbourhood = scratch[0][..., :shape[-1]]
+        centre = scratch[1][..., :shape[-1]]
+    np.multiply(row[..., :-2], 4, out=neighbourhood)
+    np.multiply(row[..., 1:-1], 2, out=centre)
+    neighbourhood |= centre
+    neighbourhood |= row[..., 2:]
+    if rule_table.ndim == 1:
+        return np.take(rule_table, neighbourhood, out=out, mode='clip')
+    # row k looks its neighbourhoods up in entries 8*k to 8*k + 7
+    offsets = 8*np.arange(len(rule_table), dtype=np.intp)[:, None]
+    return np.take(rule_table.reshape(-1), neighbourhood + offsets, out=out, mode='clip')
+
+def evolve_vectorized(first_row, first_generation, generations, rule_num):
+    # evolves first_row, generation first_generation of an unbounded grid, up
+    # to generation generations - 1. Returns the rows and where the grid of
+    # the deque engines lies in them, as its left edge and length
+    import numpy as np
+
+    rule_table = np.array(decode_rule(rule_num), dtype=np.uint8)
+    cell_number = len(first_row)
+    rows = generations - first_generation
+
+    background = np.array(background_cells(generations, rule_num)[first_generation:], dtype=np.uint8)
+
+    # the widest grid the deque engines can pad to: three cells past the light
+    # cone on each side. Beyond the light cone there are only background cells
+    total_width = cell_number + 2*(rows - 1) + 6
+    margin = (total_width - cell_number) // 2
+
+    auto_lattice = np.empty((rows, total_width), dtype=np.uint8)
+    auto_lattice[:] = background[:, None]
+    auto_lattice[0, margin:margin + cell_number] = first_row
+
+    scratch = (np.empty(total_width, dtype=np.uint8), np.empty(total_width, dtype=np.uint8))
+
+    # only the cells lo to hi differ from the background, so only they and
+    # one cell on either side are evolved; the rest is background already
+    lo, hi = active_span(auto_lattice[0], margin, margin + cell_number, background[0])
+
+    for i in range(rows - 1):
+        row = auto_lattice[i]
+        start = lo - 1
+        stop = hi + 1
+        if stop - start <= 2:
+            continue
+
+        evolve_cells(rule_table, row[start - 1:stop + 1], auto_lattice[i + 1, start:stop], scratch)
+        lo, hi = active_span(auto_lattice[i + 1], start, stop, background[i + 1])
+
+    # the grid is padded to the widest generation of the deque engines,
+    # which grow by two cells per side whenever the pattern reaches one of
+    # the two outermost cells
+    left = margin
+    length = cell_number
+
+    for i in range(rows):
+        row = auto_lattice[i]
+        bg = background[i]
+        if (row[left] != bg or row[left + 1] != bg or
+                row[left + length - 1] != bg or row[left + length - 2] != bg):
+            left -= 2
+            length += 4
+
+    return auto_lattice, left, length
+
+def vectorized_rules(generations, initial_config, rule_num):
+    import numpy as np
+
+    cells = initial_cells(initial_config)
+
+    if generations < 1:
+        if rule_num % 2 == 0:
+            return np.zeros((0, len(cells)), dtype=np.uint8)
+        # the odd rule engines always keep generation 0
+        generations = 1
+
+    auto_lattice, left, length = evolve_vectorized(np.array(cells, dtype=np.uint8), 0, generations, rule_num)
+    return np.ascontiguousarray(auto_lattice[:, left:left + length])
+
+def evolve_torus(first_row, generations, rule_num, out=None, first_generation=0):
+    # evolves first_row, generation first_generation, around a torus of its
+    # own width; row 0 of the result is first_row itself
+    import numpy as np
+
+    rule_table = np.array(decode_rule(rule_num), dtype=np.uint8)
+    wrap_width = len(first_row)
+    background = background_cells(first_generation + generations, rule_num)[first_generation:]
+
+    if out is None:
+        out = np.empty((generations, wrap_width), dtype=np.uint8)
+    auto_lattice = out
+    auto_lattice[0] = first_row
+    auto_lattice[1:] = np.array(background[1:], dtype=np.uint8)[:, None]
+
+    ring = np.empty(wrap_width + 2, dtype=np.uint8)
+    scratch = (np.empty(wrap_width, dtype=np.uint8), np.empty(wrap_width, dtype=np.uint8))
+
+    # while the cells lo to hi that differ from the background stay clear
+    # of the seam, only they and one cell on either side are evolved
+    lo, hi = active_span(auto_lattice[0], 0, wrap_width, background[0])
+
+    for i in range(generations - 1):
+        if lo >= hi:
+            continue
+        if lo >= 2 and hi <= wrap_width - 2:
+            row = auto_lattice[i]
+            start = lo - 1
+            stop = hi + 1
+            evolve_cells(rule_table, row[start - 1:stop + 1], auto_lattice[i + 1, start:stop], scratch)
+        else:
+            ring[1:-1] = auto_lattice[i]
+            ring[0] = ring[-2]
+            ring[-1] = ring[1]
+            evolve_cells(rule_table, ring, auto_lattice[i + 1], scratch)
+            start = 0
+            stop = wrap_width
+        lo, hi = active_span(auto_lattice[i + 1], start, stop, background[i + 1])
+
+    return auto_lattice
+
+def torus_cells(initial_config, wrap_width):
+    # the initial configuration centred on (or cropped to) the torus
+    cells = initial_cells(initial_config)
+    cell_number = len(cells)
+    if cell_number > wrap_width:
+        trim = (cell_number - wrap_width) // 2
+        return cells[trim:trim + wrap_width]
+    pad = (wrap_width - cell_number) // 2
+    return [0]*pad + cells + [0]*pad
+
+def vectorized_rules_wrap(generations, initial_config, rule_num, wrap_width):
+    import numpy as np
+
+    check_wrap(initial_config, wrap_width)
+
+    if generations < 1:
+        if rule_num % 2 == 0:
+            return np.zeros((0, wrap_width), dtype=np.uint8)
+        generations = 1
+
+    return evolve_torus(np.array(torus_cells(initial_config, wrap_width), dtype=np.uint8), generations, rule_num)
+
+def mirror_rule(rule_num):
+    # the rule with its left and right neighbours swapped
+    rule_little_endian = decode_rule(rule_num)
+    return sum(rule_little_endian[(k & 2) | (k >> 2) | ((k & 1) << 2)] << k for k in range(8))
+
+def complement_rule(rule_num):
+    # the rule with 0 and 1 swapped in its neighbourhoods and results
+    rule_little_endian = decode_rule(rule_num)
+    return sum((1 - rule_little_endian[7 - k]) << k for k in range(8))
+
+def equivalent_rules(rule_num):
+    mirrored = mirror_rule(rule_num)
+    return sorted(set([rule_num, mirrored, complement_rule(rule_num), complement_rule(mirrored)]))
+
+def rule_classes():
+    # the 88 classes the 256 rules fall into under reflection and complement
+    return sorted(set(tuple(equivalent_rules(rule_num)) for rule_num in range(256)))
+
+def canonicalize(rule_num, initial_config, wrap_width=None):
+    # the representative rule of rule_num's class with the initial
+    # configuration it has to start from, and whether its grid then has to be
+    # mirrored and/or complemented to give the grid of rule_num. Unbounded
+    # grids start on a background of 0 cells, which complementing would turn
+    # into 1 cells, so they are only ever mirrored
+    transforms = [(rule_num, False, False), (mirror_rule(rule_num), True, False)]
+    if wrap_width is not None:
+        complemented = complement_rule(rule_num)
+        transforms += [(complemented, False, True), (mirror_rule(complemented), True, True)]
+
+    rep_rule, mirrored, complemented = min(transforms, key=lambda x: x[0])
+
+    rep_config = initial_config
+    if complemented:
+        rep_config = ''.join('1' if x == 0 else '0' for x in torus_cells(rep_config, wrap_width))
+    if mirrored:
+        rep_config = rep_config[::-1]
+
+    return rep_rule, rep_config, mirrored, complemented
+
+def transform_lattice(auto_lattice, mirrored, complemented):
+    # turns the grid of the representative rule from canonicalize into the
+    # grid of the rule it stands for
+    if mirrored:
+        auto_lattice = auto_lattice[:, ::-1]
+    if complemented:
+        auto_lattice = auto_lattice ^ 1
+    return auto_lattice
+
+def window_lengths(auto_lattice, initial_config, rule_num):
+    # the width each generation of an unbounded grid from vectorized_rules
+    # had been padded to at that point; the grid for fewer generations is
+    # the centre of that many columns
+    background = background_cells(len(auto_lattice), rule_num)
+    width = auto_lattice.shape[1]
+    length = len(initial_cells(initial_config))
+    lengths = []
+
+    for i in range(len(auto_lattice)):
+        row = auto_lattice[i]
+        left = (width - length) // 2
+        bg = background[i]
+        if (row[left] != bg or row[left + 1] != bg or
+                row[left + length - 1] != bg or row[left + length - 2] != bg):
+            length += 4
+        lengths.append(length)
+
+    return lengths
+
+def resume_rule(auto_lattice, generations, initial_config, rule_num, wrap_width=None):
+    # the grid of vectorized_rules (or vectorized_rules_wrap) for
+    # `generations`, from its grid for any other positive number of
+    # generations: a longer grid is sliced, a shorter one is continued from
+    # its last generation
+    import numpy as np
+
+    done = len(auto_lattice)
+
+    if generations <= done:
+        if wrap_width is not None:
+            return auto_lattice[:generations]
+        length = window_lengths(auto_lattice[:generations], initial_config, rule_num)[-1]
+        crop = (auto_lattice.shape[1] - length) // 2
+        return auto_lattice[:generations, crop:crop + length]
+
+    if wrap_width is not None:
+        result = np.empty((generations, wrap_width), dtype=np.uint8)
+        result[:done] = auto_lattice
+        evolve_torus(auto_lattice[-1], generations - done + 1, rule_num, out=result[done - 1:], first_generation=done - 1)
+        return result
+
+    tail, left, length = evolve_vectorized(auto_lattice[-1], done - 1, generations, rule_num)
+
+    background = np.array(background_cells(generations, rule_num), dtype=np.uint8)
+    result = np.empty((generations, length), dtype=np.uint8)
+    result[:done] = background[:done, None]
+    pad = (length - auto_lattice.shape[1]) // 2
+    result[:done, pad:pad + auto_lattice.shape[1]] = auto_lattice
+    result[done:] = tail[1:, left:left + length]
+    return result
+
+WORD_BITS = 64
+
+def rule_expression(rule_num):
+    # the rule as an exclusive or of products of the left, centre and right
+    # cells (its algebraic normal form), e.g. rule 90 is 'l ^ r'
+    coefficients = decode_rule(rule_num)
+    for bit in (1, 2, 4):
+        for k in range(8):
+            if k & bit:
+                coefficients[k] ^= coefficients[k ^ bit]
+
+    terms = []
+    for k in range(8):
+        if coefficients[k]:
+            names = [name for name, bit in (('l', 4), ('c', 2), ('r', 1)) if k & bit]
+            if len(names) == 0:
+                terms.append('ones')
+            else:
+                terms.append(' & '.join(names))
+
+    if len(terms) == 0:
+        return '0'
+    return ' ^ '.join(terms)
+
+rule_functions = {}
+
+def rule_function(rule_num):
+    if rule_num not in rule_functions:
+        rule_functions[rule_num] = eval('lambda l, c, r, ones: ' + rule_expression(rule_num))
+    return rule_functions[rule_num]
+
+def pack_cells(cells):
+    import numpy as np
+    cells = np.asarray(cells, dtype=np.uint8)
+    words = -(-cells.shape[-1] // WORD_BITS)
+    byte_count = -(-cells.shape[-1] // 8)
+    packed = np.zeros(cells.shape[:-1] + (words*8,), dtype=np.uint8)
+    packed[..., :byte_count] = np.packbits(cells, axis=-1, bitorder='little')
+    return packed.view('<u8').astype(np.uint64, copy=False)
+
+def unpack_cells(packed, width, offset=0):
+    import numpy as np
+    packed = np.asarray(packed).astype('<u8', copy=False)
+    cells = np.unpackbits(packed.view(np.uint8), axis=-1, bitorder='little')
+    return cells[..., offset:offset + width]
+
+def shift_packed(packed, offset, width):
+    # move cell `offset` of every packed row to cell 0 and keep `width` cells
+    import numpy as np
+    word_offset, bit_offset = divmod(offset, WORD_BITS)
+    words = -(-width // WORD_BITS)
+    source = packed[..., word_offset:]
+    if bit_offset == 0:
+        shifted = source[..., :words].copy()
+    else:
+        shifted = source >> np.uint64(bit_offset)
+        shifted[..., :-1] |= source[..., 1:] << np.uint64(WORD_BITS - bit_offset)
+        shifted = shifted[..., :words].copy()
+    if width % WORD_BITS:
+        shifted[..., -1] &= np.uint64((1 << (width % WORD_BITS)) - 1)
+    return shifted
+
+def packed_cell(row, position):
+    return (int(row[position // WORD_BITS]) >> (position % WORD_BITS)) & 1
+
+def bitpacked_shape(generations, initial_config, rule_num, wrap_width=None):
+    if generations < 1:
+        # the odd rule engines always keep generation 0
+        generations = rule_num % 2
+
+    if wrap_width is not None:
+        width = wrap_width
+    elif generations == 0:
+        width = len(initial_cells(initial_config))
+    else:
+        width = light_cone_width(initial_config, generations) + 6
+
+    return generations, -(-width // WORD_BITS)
+
+def evolve_bitpacked(generations, initial_config, rule_num, out=None):
+    import numpy as np
+
+    evolve = rule_function(rule_num)
+    cells = initial_cells(initial_config)
+    cell_number = len(cells)
+
+    generations, words = bitpacked_shape(generations, initial_config, rule_num)
+    if out is None:
+        out = np.empty((generations, words), dtype=np.uint64)
+    auto_lattice = out
+
+    if generations == 0:
+        return auto_lattice, 0, cell_number
+
+    background = background_cells(generations, rule_num)
+
+    total_width = light_cone_width(initial_config, generations) + 6
+    margin = (total_width - cell_number) // 2
+    last_bit = (total_width - 1) % WORD_BITS
+    ones = np.full(words, np.uint64(2**64 - 1))
+    mask = np.uint64((1 << (last_bit + 1)) - 1)
+
+    first_row = [0]*margin + cells + [0]*margin
+    auto_lattice[0] = pack_cells(first_row)
+
+    left_cells = np.empty(words, dtype=np.uint64)
+    right_cells = np.empty(words, dtype=np.uint64)
+
+    left = margin
+    length = cell_number
+
+    for i in range(generations):
+        row = auto_lattice[i]
+        bg = background[i]
+        if (packed_cell(row, left) != bg or packed_cell(row, left + 1) != bg or
+                packed_cell(row, left + length - 1) != bg or packed_cell(row, left + length - 2) != bg):
+            left -= 2
+            length += 4
+
+        if i == generations - 1:
+            break
+
+        # cells outside the buffer are background cells
+        np.left_shift(row, np.uint64(1), out=left_cells)
+        left_cells[1:] |= row[:-1] >> np.uint64(WORD_BITS - 1)
+        left_cells[0] |= np.uint64(bg)
+        np.right_shift(row, np.uint64(1), out=right_cells)
+        right_cells[:-1] |= row[1:] << np.uint64(WORD_BITS - 1)
+        right_cells[-1] |= np.uint64(bg << last_bit)
+
+        auto_lattice[i + 1] = evolve(left_cells, row, right_cells, ones)
+        auto_lattice[i + 1, -1] &= mask
+
+    # the grid starts `left` cells into every row of the buffer
+    return auto_lattice, left, length
+
+def bitpacked_rules(generations, initial_config, rule_num):
+    auto_lattice, left, length = evolve_bitpacked(generations, initial_config, rule_num)
+    return shift_packed(auto_lattice, left, length), length
+
+def bitpacked_rules_wrap(generations, initial_config, rule_num, wrap_width, out=None):
+    import numpy as np
+
+    check_wrap(initial_config, wrap_width)
+
+    evolve = rule_function(rule_num)
+
+    generations, words = bitpacked_shape(generations, initial_config, rule_num, wrap_width)
+    if out is None:
+        out = np.empty((generations, words), dtype=np.uint64)
+    auto_lattice = out
+
+    if generations == 0:
+        return auto_lattice, wrap_width
+
+    first_row = torus_cells(initial_config, wrap_width)
+
+    last_word = (wrap_width - 1) // WORD_BITS
+    last_bit = np.uint64((wrap_width - 1) % WORD_BITS)
+    ones = np.full(words, np.uint64(2**64 - 1))
+    mask = np.uint64((1 << (int(last_bit) + 1)) - 1)
+
+    auto_lattice[0] = pack_cells(first_row)
+
+    left_cells = np.empty(words, dtype=np.uint64)
+    right_cells = np.empty(words, dtype=np.uint64)
+
+    for i in range(generations - 1):
+        row = auto_lattice[i]
+
+        # carry the neighbours across word boundaries, then across the seam
+        # between the last and the first cell of the torus
+        np.left_shift(row, np.uint64(1), out=left_cells)
+        left_cells[1:] |= row[:-1] >> np.uint64(WORD_BITS - 1)
+        left_cells[0] |= (row[last_word] >> last_bit) & np.uint64(1)
+        np.right_shift(row, np.uint64(1), out=right_cells)
+        right_cells[:-1] |= row[1:] << np.uint64(WORD_BITS - 1)
+        right_cells[last_word] |= (row[0] & np.uint64(1)) << last_bit
+
+        auto_lattice[i + 1] = evolve(left_cells, row, right_cells, ones)
+        auto_lattice[i + 1, -1] &= mask
+
+    return auto_lattice, wrap_width
+
+def light_cone_width(initial_config, generations):
+    # a pattern grows by at most one cell per side and generation, so this
+    # is as wide as any of the first `generations` generations can get
+    return len(initial_cells(initial_config)) + 2*max(generations - 1, 0)
+
+def pad_row(row, width, fill_cell):
+    import numpy as np
+    if len(row) == width:
+        return row
+    if len(row) > width:
+        removes = (len(row) - width) // 2
+        return row[removes:removes + width]
+    padded = np.full(width, fill_cell, dtype=np.uint8)
+    adds = (width - len(row)) // 2
+    padded[adds:adds + len(row)] = row
+    return padded
+
+def buffered_rows(initial_config, rule_num, wrap_width=None, generations=None, width=None, offset=None):
+    # the rows of iter_rule evolved into two preallocated buffers in turn:
+    # every row yielded is a view of a buffer that gets overwritten two
+    # generations later. Unbounded rows need `generations` to size the
+    # buffers, and only the cells the `width` cells yielded depend on are
+    # evolved
+    import numpy as np
+
+    rule_table = np.array(decode_rule(rule_num), dtype=np.uint8)
+    cells = np.array(initial_cells(initial_config), dtype=np.uint8)
+    cell_number = len(cells)
+
+    if wrap_width is not None:
+        check_wrap(initial_config, wrap_width)
+        # each buffer holds a row with its last cell before its first and
+        # its first cell after its last
+        buffers = [np.zeros(wrap_width + 2, dtype=np.uint8) for i in range(2)]
+        buffers[0][1:-1] = pad_row(cells, wrap_width, 0)
+        first = 1
+        last = wrap_width + 1
+    else:
+        if width is None:
+            width = light_cone_width(initial_config, generations)
+        if offset is None:
+            # placed like pad_row does, which rounds the other way when it
+            # crops than when it pads
+            offsets = (-((width - cell_number) // 2), (cell_number - width) // 2)
+        else:
+            offsets = (offset, offset)
+        # generation i covers the cells first - i to first + cell_number + i
+        # of the buffers, which are wide enough for the light cone to never
+        # reach their ends and for the `width` cells yielded
+        first = max(generations, -min(offsets), 1)
+        padded_start = first + offsets[0]
+        cropped_start = first + offsets[1]
+        buffer_width = max(first + cell_number + generations + 1, first + max(offsets) + width)
+        buffers = [np.zeros(buffer_width, dtype=np.uint8) for i in range(2)]
+        buffers[0][first:first + cell_number] = cells
+        last = first + cell_number
+    scratch = (np.empty(len(buffers[0]) - 2, dtype=np.uint8), np.empty(len(buffers[0]) - 2, dtype=np.uint8))
+
+    # outside the cells spans[b] every cell of buffer b is fill_cells[b], the
+    # background cell of its generation, so only the span of a row and one
+    # cell on either side are evolved into the other buffer
+    rule_little_endian = decode_rule(rule_num)
+    fill_cell = 0
+    fill_cells = [0, 0]
+    spans = [active_span(buffers[0], first, last, 0), (0, 0)]
+
+    i = 0
+    while generations is None or i < generations:
+        row = buffers[i % 2]
+        following = buffers[(i + 1) % 2]
+        if wrap_width is not None:
+            yield row[1:-1]
+        else:
+            start = padded_start if cell_number + 2*i < width else cropped_start
+            yield row[start:start + width]
+            if i == generations - 1:
+                break
+
+        lo, hi = spans[i % 2]
+        fill_cell = rule_little_endian[7*fill_cell]
+        if wrap_width is not None and lo < hi and (lo < 3 or hi > wrap_width - 1):
+            # the span reaches the seam: the whole torus is evolved
+            row[0] = row[-2]
+            row[-1] = row[1]
+            evolve_cells(rule_table, row, following[1:-1], scratch)
+            lo, hi = active_span(following, 1, wrap_width + 1, fill_cell)
+        else:
+            if fill_cells[(i + 1) % 2] == fill_cell:
+                following[slice(*spans[(i + 1) % 2])] = fill_cell
+            else:
+                following[:] = fill_cell
+            left = lo - 1
+            right = hi + 1
+            if wrap_width is None:
+                # generation i + 1 is only needed generations - 2 - i cells
+                # either side of the cells yielded
+                reach = generations - 2 - i
+                left = max(left, min(padded_start, cropped_start) - reach)
+                right = min(right, max(padded_start, cropped_start) + width + reach)
+            if lo < hi and left < right:
+                evolve_cells(rule_table, row[left - 1:right + 1], following[left:right], scratch)
+                lo, hi = active_span(following, left, right, fill_cell)
+            else:
+                lo = hi
+        fill_cells[(i + 1) % 2] = fill_cell
+        spans[(i + 1) % 2] = (lo, hi)
+        i += 1
+
+def iter_rule(initial_config, rule_num, wrap_width=None, generations=None, width=None, history=True, offset=None):
+    # with history False the rows are views of two buffers the generations
+    # are evolved into in turn (see buffered_rows), only valid until the row
+    # after next is asked for; with history True every row is a copy. offset
+    # starts the unbounded rows of a given number of generations at that
+    # cell of the initial configuration instead of centring them
+    import numpy as np
+
+    if wrap_width is not None or generations is not None:
+        for row in buffered_rows(initial_config, rule_num, wrap_width, generations, width, offset):
+            yield row.copy() if history else row
+        return
+
+    # without `generations` the unbounded rows keep growing, so every one is
+    # a new array, covering only the cells the pattern can have reached
+    rule_table = np.array(decode_rule(rule_num), dtype=np.uint8)
+    row = np.array(initial_cells(initial_config), dtype=np.uint8)
+
+    fill_cell = 0
+    while True:
+        if width is None:
+            yield row
+        else:
+            yield pad_row(row, width, fill_cell)
+
+        ring = np.empty(len(row) + 4, dtype=np.uint8)
+        ring[:2] = fill_cell
+        ring[-2:] = fill_cell
+        ring[2:-2] = row
+
+        row = evolve_cells(rule_table, ring)
+        fill_cell = int(rule_table[7*fill_cell])
+
+def batch_configs(initial_configs):
+    # a 2-D uint8 array of initial configurations, from such an array or a
+    # list of equally long strings
+    import numpy as np
+    if len(initial_configs) > 0 and isinstance(initial_configs[0], str):
+        return np.array([initial_cells(x) for x in initial_configs], dtype=np.uint8)
+    return np.asarray(initial_configs, dtype=np.uint8)
+
+def iter_batch(initial_configs, rule_nums, wrap_width=None, generations=None):
+    # iter_rule for many initial configurations and rules at once: yields
+    # one (batch, width) array per generation, row k evolving
+    # initial_configs[k] by rule_nums[k] (or by rule_nums, if it is a number)
+    import numpy as np
+
+    cells = batch_configs(initial_configs)
+    batch, cell_number = cells.shape
+    rule_nums = np.broadcast_to(np.asarray(rule_nums), (batch,))
+
+    # every sample looks its neighbourhoods up in its own row of 8 entries
+    rule_tables = np.array([decode_rule(int(x)) for x in rule_nums], dtype=np.uint8).reshape(batch, 8)
+
+    width = None
+    if wrap_width is not None:
+        check_wrap([0]*cell_number, wrap_width)
+        if cell_number > wrap_width:
+            trim = (cell_number - wrap_width) // 2
+            row = cells[:, trim:trim + wrap_width].copy()
+        else:
+            row = np.zeros((batch, wrap_width), dtype=np.uint8)
+            pad = (wrap_width - cell_number) // 2
+            row[:, pad:pad + cell_number] = cells
+        ring = np.empty((batch, wrap_width + 2), dtype=np.uint8)
+        scratch = (np.empty((batch, wrap_width), dtype=np.uint8), np.empty((batch, wrap_width), dtype=np.uint8))
+    else:
+        if generations is not None:
+            width = cell_number + 2*max(generations - 1, 0)
+        row = cells
+        scratch = None
+
+    fill_cells = np.zeros(batch, dtype=np.uint8)
+    i = 0
+    while generations is None or i < generations:
+        if width is None:
+            yield row
+        else:
+            padded = np.empty((batch, width), dtype=np.uint8)
+            padded[:] = fill_cells[:, None]
+            adds = (width - row.shape[1]) // 2
+            padded[:, adds:adds + row.shape[1]] = row
+            yield padded
+
+        if wrap_width is not None:
+            ring[:, 1:-1] = row
+            ring[:, 0] = ring[:, -2]
+            ring[:, -1] = ring[:, 1]
+        else:
+            ring = np.empty((batch, row.shape[1] + 4), dtype=np.uint8)
+            ring[:, :2] = fill_cells[:, None]
+            ring[:, -2:] = fill_cells[:, None]
+            ring[:, 2:-2] = row
+
+        row = evolve_cells(rule_tables, ring, scratch=scratch)
+        fill_cells = rule_tables[np.arange(batch), 7*fill_cells]
+        i += 1
+
+def batch_rule(generations, initial_configs, rule_nums, wrap_width=None, canonical=True):
+    # the grids of iter_batch as one (batch, generations, width) array. With
+    # canonical, samples whose grids are mirror images or complements of
+    # each other (see canonicalize) are only simulated once
+    import numpy as np
+
+    cells = batch_configs(initial_configs)
+    batch = len(cells)
+    rule_nums = np.broadcast_to(np.asarray(rule_nums), (batch,))
+
+    if not canonical:
+        rows = list(iter_batch(cells, rule_nums, wrap_width, max(generations, 0)))
+        if len(rows) == 0:
+            return np.zeros((batch, 0, cells.shape[1] if wrap_width is None else wrap_width), dtype=np.uint8)
+        return np.stack(rows, axis=1)
+
+    if wrap_width is not None:
+        # complements have to cover the whole torus
+        check_wrap([0]*cells.shape[1], wrap_width)
+        configs = [''.join(str(x) for x in torus_cells(''.join(str(x) for x in row), wrap_width)) for row in cells]
+    else:
+        configs = [''.join(str(x) for x in row) for row in cells]
+
+    samples = {}
+    transforms = []
+    for k in range(batch):
+        rep_rule, rep_config, mirrored, complemented = canonicalize(int(rule_nums[k]), configs[k], wrap_width)
+        index = samples.setdefault((rep_rule, rep_config), len(samples))
+        transforms.append((index, mirrored, complemented))
+
+    keys = sorted(samples, key=samples.get)
+    rep_cells = np.array([[int(x) for x in key[1]] for key in keys], dtype=np.uint8)
+    rep_rules = [key[0] for key in keys]
+    rep_lattice = batch_rule(generations, rep_cells, rep_rules, wrap_width, canonical=False)
+
+    auto_lattice = np.empty((batch,) + rep_lattice.shape[1:], dtype=np.uint8)
+    for k in range(batch):
+        index, mirrored, complemented = transforms[k]
+        auto_lattice[k] = transform_lattice(rep_lattice[index], mirrored, complemented)
+    return auto_lattice
+
+def perturbed_configs(initial_config, flips):
+    # the cells of initial_config (see initial_cells) and, for every entry of
+    # flips, a copy with that cell, or each of that list of cells, flipped
+    cells = initial_cells(initial_config)
+    configs = [cells]
+    for flip in flips:
+        perturbed = list(cells)
+        for position in (flip if isinstance(flip, (list, tuple)) else [flip]):
+            if not -len(cells) <= position < len(cells):
+                raise ValueError("Cannot flip cell " + str(position) + " of an initial configuration of " + str(len(cells)) + " cells.")
+            perturbed[position] ^= 1
+        configs.append(perturbed)
+    return configs
+
+def iter_damage(initial_config, rule_num, flips=None, wrap_width=None, generations=None):
+    # evolves initial_config and a perturbed copy of it for every entry of
+    # flips (by default its middle cell) together in one iter_batch, and
+    # yields for every generation the cells where each copy differs from
+    # the original, as a (len(flips), width) array
+    cells = initial_cells(initial_config)
+    if flips is None:
+        flips = [len(cells) // 2]
+    for row in iter_batch(perturbed_configs(cells, flips), rule_num, wrap_width, generations):
+        yield row[1:] ^ row[:1]
+
+def damage_rule(generations, initial_config, rule_num, flips=None, wrap_width=None):
+    # the number of cells each perturbation of iter_damage changes in every
+    # generation, and the width from the first to the last of them (0 when
+    # there are none), as two (len(flips), generations) arrays
+    import numpy as np
+
+    if flips is None:
+        flips = [len(initial_cells(initial_config)) // 2]
+    generations = max(generations, 0)
+    weights = np.zeros((len(flips), generations), dtype=np.int64)
+    widths = np.zeros((len(flips), generations), dtype=np.int64)
+
+    for i, damage in enumerate(iter_damage(initial_config, rule_num, flips, wrap_width, generations)):
+        weights[:, i] = np.count_nonzero(damage, axis=1)
+        first = damage.argmax(axis=1)
+        last = damage.shape[1] - 1 - damage[:, ::-1].argmax(axis=1)
+        widths[:, i] = np.where(weights[:, i] > 0, last - first + 1, 0)
+    return weights, widths
+
+def rule_width(generations, initial_config, rule_num):
+    # the width of the grid generate_rule returns, found without keeping
+    # more than one generation: the deque engines grow by two cells per side
+    # whenever the pattern reaches one of their two outermost cells
+
+    background = background_cells(max(generations, 1), rule_num)
+    rows = itertools.islice(iter_rule(initial_config, rule_num), max(generations, 1))
+    left = 0
+    length = len(initial_cells(initial_config))
+
+    for i, row in enumerate(rows):
+        for position in (left, left + 1, left + length - 2, left + length - 1):
+            if 0 <= position + i < len(row) and row[position + i] != background[i]:
+                left -= 2
+                length += 4
+                break
+
+    return length
+
+class RowGrid(object):
+
+    # what Lattice and LazyLattice have in common, given __len__,
+    # __getitem__ and width
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def shape(self):
+        return (len(self), self.width)
+
+    def iter_deques(self):
+        for row in self:
+            yield deque(row.tolist())
+
+    def to_deques(self):
+        return list(self.iter_deques())
+
+class Lattice(RowGrid):
+
+    # data holds one row per generation, either one uint8 per cell or, when
+    # packed is True, the uint64 words of bitpacked_rules with the grid
+    # starting `offset` cells into each row
+
+    def __init__(self, data, width=None, packed=False, offset=0):
+        self.data = data
+        self.packed = packed
+        self.offset = offset
+        if width is None:
+            width = data.shape[1]
+        self.width = width
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Lattice(self.data[key], self.width, self.packed, self.offset)
+        if self.packed:
+            return unpack_cells(self.data[key], self.width, self.offset)
+        return self.data[key]
+
+    def __array__(self, dtype=None, copy=None):
+        # shares data unless copy is True; unpacking a bit-packed grid or
+        # changing the dtype copies it, which copy=False does not allow
+        import numpy as np
+        if copy is False and (self.packed or (dtype is not None and np.dtype(dtype) != np.uint8)):
+            raise ValueError("The Lattice cannot be turned into this array without copying it.")
+        if self.packed:
+            cells = unpack_cells(self.data, self.width, self.offset)
+            copy = False
+        else:
+            cells = self.data
+        if dtype is not None:
+            return cells.astype(dtype, copy=bool(copy))
+        return cells.copy() if copy else cells
+
+    def memoryview(self):
+        # the cells as a 2-D buffer of bytes, on any Python version: shared
+        # with data, or unpacked into a copy when the grid is bit-packed
+        return memoryview(self.__array__())
+
+    def __buffer__(self, flags):
+        # memoryview(lattice), from Python 3.12 on
+        return self.memoryview()
+
+    def crop(self, start, stop):
+        if self.packed:
+            offset = self.offset + start
+            self.data = self.data[:, offset // WORD_BITS:-(-(offset + stop - start) // WORD_BITS)]
+            self.offset = offset % WORD_BITS
+        else:
+            self.data = self.data[:, start:stop]
+        self.width = stop - start
+        return self
+
+class CycleLattice(Lattice):
+
+    # a Lattice of `generations` rows of which data only holds the first
+    # transient + period: every row after those repeats the row `period`
+    # rows before it. A period of 0 means no row repeats
+
+    def __init__(self, data, generations, transient, period, width=None, packed=False, offset=0):
+        Lattice.__init__(self, data, width, packed, offset)
+        self.generations = generations
+        self.transient = transient
+        self.period = period
+
+    def __len__(self):
+        return self.generations
+
+    def row_index(self, i):
+        if i < self.transient:
+            return i
+        return self.transient + (i - self.transient) % self.period
+
+    def row_indices(self, key=slice(None)):
+        import numpy as np
+        indices = np.arange(*key.indices(len(self)), dtype=np.intp)
+        repeats = indices >= self.transient
+        indices[repeats] = self.transient + (indices[repeats] - self.transient) % self.period
+        return indices
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Lattice(self.data[self.row_indices(key)], self.width, self.packed, self.offset)
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError("Generation out of range.")
+        return Lattice.__getitem__(self, self.row_index(key))
+
+    def __array__(self, dtype=None, copy=None):
+        if copy is False:
+            raise ValueError("The repeated generations of a CycleLattice cannot be turned into an array without copying them.")
+        return self[:].__array__(dtype)
+
+    def memoryview(self):
+        return self[:].memoryview()
+
+def find_cycle(rows):
+    # reads rows until one repeats an earlier row and returns the rows read
+    # before it, the number of rows before the cycle and the length of the
+    # cycle (0 if the rows run out first)
+    seen = {}
+    kept = []
+    for row in rows:
+        key = hash(row.tobytes())
+        for earlier in seen.get(key, ()):
+            if (kept[earlier] == row).all():
+                return kept, earlier, len(kept) - earlier
+        seen.setdefault(key, []).append(len(kept))
+        kept.append(row)
+    return kept, len(kept), 0
+
+def cycle_rules_wrap(generations, initial_config, rule_num, wrap_width):
+    # vectorized_rules_wrap that stops simulating once a generation repeats
+    # an earlier one; the grid returned replays the cycle for the rest
+    import numpy as np
+
+    if generations < 1:
+        auto_lattice = vectorized_rules_wrap(generations, initial_config, rule_num, wrap_width)
+        return CycleLattice(auto_lattice, len(auto_lattice), len(auto_lattice), 0)
+    check_wrap(initial_config, wrap_width)
+
+    rows, transient, period = find_cycle(iter_rule(initial_config, rule_num, wrap_width=wrap_width, generations=generations))
+    return CycleLattice(np.array(rows, dtype=np.uint8).reshape(len(rows), wrap_width), generations, transient, period)
+
+class LazyLattice(RowGrid):
+
+    # the generations of iter_rule, padded to the width of the widest one,
+    # computed only when they are asked for. Unbounded, that is the whole
+    # light cone rather than the grid of generate_rule. Every `checkpoint`th generation
+    # is kept once it has been computed, so a generation is never computed
+    # from further back than the checkpoint before it
+
+    def __init__(self, generations, initial_config, rule_num, wrap_width=None, checkpoint=1024):
+        import numpy as np
+
+        if generations < 1:
+            # the odd rule engines always keep generation 0
+            generations = rule_num % 2
+        if wrap_width is not None:
+            check_wrap(initial_config, wrap_width)
+            full_width = wrap_width
+        else:
+            full_width = light_cone_width(initial_config, generations)
+
+        self.generations = generations
+        self.wrap_width = wrap_width
+        self.checkpoint = checkpoint
+        self.rule_table = np.array(decode_rule(rule_num), dtype=np.uint8)
+        self.start = 0
+        self.width = full_width
+
+        first_row = pad_row(np.array(initial_cells(initial_config), dtype=np.uint8), full_width, 0)
+        self.checkpoints = {0: (first_row, 0)}
+        self.cursor = (0, first_row, 0)
+
+    def __len__(self):
+        return self.generations
+
+    def advance(self, row, fill_cell):
+        import numpy as np
+        ring = np.empty(len(row) + 2, dtype=np.uint8)
+        ring[1:-1] = row
+        if self.wrap_width is not None:
+            ring[0] = row[-1]
+            ring[-1] = row[0]
+        else:
+            # the row is as wide as the light cone, past it is background
+            ring[0] = fill_cell
+            ring[-1] = fill_cell
+        return evolve_cells(self.rule_table, ring), int(self.rule_table[7*fill_cell])
+
+    def full_row(self, i):
+        # start from the last checkpoint computed before generation i, or
+        # from the last generation asked for if that is closer
+        generation = min(i // self.checkpoint * self.checkpoint, max(self.checkpoints))
+        row, fill_cell = self.checkpoints[generation]
+        if generation <= self.cursor[0] <= i:
+            generation, row, fill_cell = self.cursor
+
+        while generation < i:
+            row, fill_cell = self.advance(row, fill_cell)
+            generation += 1
+            if generation % self.checkpoint == 0:
+                self.checkpoints[generation] = (row, fill_cell)
+
+        self.cursor = (generation, row, fill_cell)
+        return row
+
+    def __getitem__(self, key):
+        import numpy as np
+        if isinstance(key, slice):
+            rows = [self[i] for i in range(*key.indices(len(self)))]
+            return Lattice(np.array(rows, dtype=np.uint8).reshape(len(rows), self.width))
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError("Generation out of range.")
+        row = self.full_row(key)
+        if self.start >= 0 and self.start + self.width <= len(row):
+            return row[self.start:self.start + self.width].copy()
+
+        # widened past the grid by fix_width, where it is all background
+        padded = np.full(self.width, self.cursor[2], dtype=np.uint8)
+        first = max(self.start, 0)
+        last = min(self.start + self.width, len(row))
+        padded[first - self.start:last - self.start] = row[first:last]
+        return padded
+
+    def __array__(self, dtype=None, copy=None):
+        if copy is False:
+            raise ValueError("The generations of a LazyLattice cannot be turned into an array without computing them.")
+        return self[:].__array__(dtype)
+
+    def crop(self, start, stop):
+        self.start += start
+        self.width = stop - start
+        return self
+
+RULE_FILE_MAGIC = b'RULEGRID'
+RULE_FILE_HEADER = struct.Struct('<8sBBB5xQQQQQ')
+RULE_FILE_HEADER_SIZE = 64
+BOUNDARY_MODES = ('unbounded', 'wrapped')
+
+def store_rule(path, generations, initial_config, rule_num, wrap_width=None):
+    import numpy as np
+
+    if wrap_width is not None and not wrap_supported(initial_config, wrap_width):
+        # a width the initial configuration cannot be centred on is left to
+        # the original engines, whose grid is packed into the file
+        grid = generate_rule_wrap(generations, initial_config, rule_num, wrap_width)
+        width = len(grid[0]) if len(grid) > 0 else wrap_width
+        packed = pack_cells(np.array([list(row) for row in grid], dtype=np.uint8).reshape(len(grid), width))
+        rows, words = packed.shape
+    else:
+        packed = None
+        rows, words = bitpacked_shape(generations, initial_config, rule_num, wrap_width)
+
+    with open(path, 'wb') as rule_file:
+        rule_file.truncate(RULE_FILE_HEADER_SIZE + rows*words*8)
+
+    if rows == 0:
+        auto_lattice = np.zeros((0, words), dtype='<u8')
+    else:
+        auto_lattice = np.memmap(path, dtype='<u8', mode='r+', offset=RULE_FILE_HEADER_SIZE, shape=(rows, words))
+
+    if packed is not None:
+        auto_lattice[:] = packed
+        offset = 0
+        boundary = 1
+    elif wrap_width is None:
+        auto_lattice, offset, width = evolve_bitpacked(generations, initial_config, rule_num, out=auto_lattice)
+        boundary = 0
+    else:
+        auto_lattice, width = bitpacked_rules_wrap(generations, initial_config, rule_num, wrap_width, out=auto_lattice)
+        offset = 0
+        boundary = 1
+
+    if rows > 0:
+        auto_lattice.flush()
+
+    header = RULE_FILE_HEADER.pack(RULE_FILE_MAGIC, 1, rule_num, boundary, rows,
+                                   wrap_width or 0, width, offset, words)
+    with open(path, 'r+b') as rule_file:
+        rule_file.write(header)
+
+    return Lattice(auto_lattice, width, packed=True, offset=offset)
+
+def rule_header(path):
+    with open(path, 'rb') as rule_file:
+        header = rule_file.read(RULE_FILE_HEADER.size)
+
+    if len(header) < RULE_FILE_HEADER.size or header[:len(RULE_FILE_MAGIC)] != RULE_FILE_MAGIC:
+        raise ValueError("Not a stored rule: " + str(path))
+
+    magic, version, rule_num, boundary, generations, wrap_width, width, offset, words = RULE_FILE_HEADER.unpack(header)
+    return {'rule_num': rule_num, 'boundary': BOUNDARY_MODES[boundary], 'generations': generations,
+            'wrap_width': wrap_width if boundary == 1 else None, 'width': width,
+            'offset': offset, 'words': words}
+
+def open_rule(path):
+    import numpy as np
+
+    header = rule_header(path)
+    if header['generations'] == 0:
+        auto_lattice = np.zeros((0, header['words']), dtype='<u8')
+    else:
+        auto_lattice = np.memmap(path, dtype='<u8', mode='r', offset=RULE_FILE_HEADER_SIZE,
+                                 shape=(header['generations'], header['words']))
+
+    return Lattice(auto_lattice, header['width'], packed=True, offset=header['offset'])
+
+def generate_rule(generations, initial_config, rule_num, backend='python', path=None, profile=None):
+    if profile is not None:
+        profile.start()
+        if backend == 'python' and path is None:
+            grid = light_cone_rules(generations, initial_config, rule_num, profile)
+        else:
+            grid = generate_rule(generations, initial_config, rule_num, backend, path)
+            profile.lap('evolve')
+        profile.finish(grid)
+        return grid
+
+    if path is not None:
+        return store_rule(path, generations, initial_config, rule_num)
+
+    if backend == 'numpy':
+        return Lattice(vectorized_rules(generations, initial_config, rule_num))
+    elif backend == 'bitpacked':
+        packed, width = bitpacked_rules(generations, initial_config, rule_num)
+        return Lattice(packed, width, packed=True)
+    elif backend == 'lazy':
+        # its rows cover the light cone, not the grid of the other backends
+        raise ValueError("The lazy backend only makes wrapped grids; LazyLattice(generations, initial_config, rule_num) gives the light cone of an infinite one.")
+    elif backend != 'python':
+        raise ValueError("Unknown backend: " + str(backend))
+
+    return light_cone_rules(generations, initial_config, rule_num)
+
+def generate_rule_wrap(generations, initial_config, rule_num, wrap_width, backend='python', path=None, profile=None):
+    if profile is not None:
+        profile.start()
+        if backend == 'python' and path is None and wrap_supported(initial_config, wrap_width):
+            grid = torus_rules(generations, initial_config, rule_num, wrap_width, profile)
+        else:
+            grid = generate_rule_wrap(generations, initial_config, rule_num, wrap_width, backend, path)
+            profile.lap('evolve')
+        profile.finish(grid)
+        return grid
+
+    if path is not None:
+        return store_rule(path, generations, initial_config, rule_num, wrap_width)
+
+    if backend == 'numpy':
+        if wrap_supported(initial_config, wrap_width):
+            return Lattice(vectorized_rules_wrap(generations, initial_config, rule_num, wrap_width))
+    elif backend == 'bitpacked':
+        if wrap_supported(initial_config, wrap_width):
+            packed, width = bitpacked_rules_wrap(generations, initial_config, rule_num, wrap_width)
+            return Lattice(packed, width, packed=True)
+    elif backend == 'lazy':
+        if wrap_supported(initial_config, wrap_width):
+            return LazyLattice(generations, initial_config, rule_num, wrap_width)
+    elif backend != 'python':
+        raise ValueError("Unknown backend: " + str(backend))
+    elif wrap_supported(initial_config, wrap_width):
+        return torus_rules(generations, initial_config, rule_num, wrap_width)
+
     if rule_num % 2 == 0:
         return even_rules_wrap(generations, initial_config, rule_num, wrap_width)
     else:
         return odd_rules_wrap(generations, initial_config, rule_num, wrap_width)
-    
+
 
 if __name__ == '__main__':
-    main(sys.argv)
+    sys.exit(main(sys.argv))
 
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+
+import rulegenerator
+
+LEAF_LEVEL = 3
+LEAF_CELLS = 1 << LEAF_LEVEL
+LEAF_MASK = (1 << LEAF_CELLS) - 1
+
+class NodeLimitReached(Exception):
+    # raised by HashLife.intern when an advance would take the node table
+    # past node_limit
+    pass
+
+class HashLife(object):
+
+    # HashLife for one rule on the infinite grid. A block of 2**level cells
+    # is a node: a leaf holds 8 cells as the bits of an integer (cell i is
+    # bit i) and every other node is a pair of half-size nodes. Nodes are
+    # interned, so a block that repeats is only stored once. advance(node, j)
+    # is the middle half of a block 2**j generations later, found from the
+    # advances of its quarters and memoised, so blocks that repeat in space
+    # or in time are only evolved once. The memo keeps the max_nodes most
+    # recently used advances, and compact() drops every node the current
+    # pattern no longer uses. While node_limit is set, making more nodes
+    # than that raises NodeLimitReached
+
+    def __init__(self, rule_num, max_nodes=2**20):
+        self.rule_table = rulegenerator.decode_rule(rule_num)
+        self.max_nodes = max_nodes
+        self.node_limit = None
+        self.memo = OrderedDict()
+        self.reset()
+
+    def reset(self):
+        self.children = []
+        self.levels = []
+        self.index = {}
+        self.backgrounds = {}
+        self.memo.clear()
+
+    def intern(self, key, level):
+        node = self.index.get(key)
+        if node is None:
+            node = len(self.children)
+            if self.node_limit is not None and node >= self.node_limit:
+                raise NodeLimitReached()
+            self.children.append(key)
+            self.levels.append(level)
+            self.index[key] = node
+        return node
+
+    def leaf(self, bits):
+        return self.intern((None, bits), LEAF_LEVEL)
+
+    def join(self, left, right):
+        return self.intern((left, right), self.levels[left] + 1)
+
+    def background(self, level, cell):
+        # the node of 2**level cells all equal to cell
+        node = self.backgrounds.get((level, cell))
+        if node is None:
+            if level == LEAF_LEVEL:
+                node = self.leaf(LEAF_MASK * cell)
+            else:
+                half = self.background(level - 1, cell)
+                node = self.join(half, half)
+            self.backgrounds[(level, cell)] = node
+        return node
+
+    def from_cells(self, cells, level):
+        if level == LEAF_LEVEL:
+            bits = 0
+            for i, cell in enumerate(cells):
+                bits |= cell << i
+            return self.leaf(bits)
+        half = 1 << (level - 1)
+        return self.join(self.from_cells(cells[:half], level - 1), self.from_cells(cells[half:], level - 1))
+
+    def cells(self, node, start, stop):
+        # the cells start to stop of a node as a list
+        result = []
+        stack = [(node, 0)]
+        while stack:
+            node, position = stack.pop()
+            size = 1 << self.levels[node]
+            if position >= stop or position + size <= start:
+                continue
+            left, right = self.children[node]
+            if left is None:
+                for i in range(max(start - position, 0), min(stop - position, size)):
+                    result.append((right >> i) & 1)
+            else:
+                stack.append((right, position + size // 2))
+                stack.append((left, position))
+        return result
+
+    def centre(self, node):
+        left, right = self.children[node]
+        if self.levels[node] == LEAF_LEVEL + 1:
+            half = LEAF_CELLS // 2
+            return self.leaf((self.children[left][1] >> half) | ((self.children[right][1] & ((1 << half) - 1)) << half))
+        return self.join(self.children[left][1], self.children[right][0])
+
+    def advance_leaves(self, left, right, steps):
+        # evolves the 16 cells of two leaves cell by cell; the middle 8 cells
+        # are all that is left after the 4 generations of a full step
+        row = self.cells(left, 0, LEAF_CELLS) + self.cells(right, 0, LEAF_CELLS)
+        for i in range(steps):
+            row = [self.rule_table[4*row[x - 1] + 2*row[x] + row[x + 1]] for x in range(1, len(row) - 1)]
+        adds = LEAF_CELLS // 2 - steps
+        bits = 0
+        for i, cell in enumerate(row[adds:adds + LEAF_CELLS]):
+            bits |= cell << i
+        return self.leaf(bits)
+
+    def advance(self, node, j):
+        key = (node, j)
+        result = self.memo.get(key)
+        if result is not None:
+            self.memo.move_to_end(key)
+            return result
+
+        level = self.levels[node]
+        left, right = self.children[node]
+        if level == LEAF_LEVEL + 1:
+            result = self.advance_leaves(left, right, 1 << j)
+        else:
+            middle = self.join(self.children[left][1], self.children[right][0])
+            if j == level - 2:
+                # two half steps: the quarters of the middle halves of the
+                # three overlapping halves, then of the two in between
+                r0 = self.advance(left, j - 1)
+                r1 = self.advance(middle, j - 1)
+                r2 = self.advance(right, j - 1)
+                result = self.join(self.advance(self.join(r0, r1), j - 1), self.advance(self.join(r1, r2), j - 1))
+            else:
+                r0 = self.centre(left)
+                r1 = self.centre(middle)
+                r2 = self.centre(right)
+                result = self.join(self.advance(self.join(r0, r1), j), self.advance(self.join(r1, r2), j))
+
+        self.memo[key] = result
+        if len(self.memo) > self.max_nodes:
+            self.memo.popitem(last=False)
+        return result
+
+    def compact(self, root):
+        # rebuilds the node table from root alone and returns root's new id
+        children = self.children
+        self.reset()
+        copies = {}
+        def copy(node):
+            if node not in copies:
+                left, right = children[node]
+                if left is None:
+                    copies[node] = self.leaf(right)
+                else:
+                    copies[node] = self.join(copy(left), copy(right))
+            return copies[node]
+        return copy(root)
+
+def background_at(rule_table, generation):
+    # background_cells for a single, possibly huge, generation
+    if generation == 0 or rule_table[0] == 0:
+        return 0
+    if generation % 2 == 1 or rule_table[7] == 1:
+        return 1
+    return 0
+
+def iter_states(initial_config, rule_num, generations, start=None, stop=None, max_nodes=2**20):
+    # yields generation n of the infinite grid for every n of the increasing
+    # sequence generations, each as the NumPy row iter_rule would yield for
+    # it (or the cells start to stop of that row)
+    import numpy as np
+
+    hashlife = HashLife(rule_num, max_nodes)
+    cells = rulegenerator.initial_cells(initial_config)
+    cell_number = len(cells)
+
+    level = LEAF_LEVEL + 1
+    while (1 << level) < cell_number:
+        level += 1
+    root = hashlife.from_cells(cells + [0]*((1 << level) - cell_number), level)
+    # root covers the cells origin to origin + 2**level, initial cell 0
+    # being cell 0
+    origin = 0
+    generation = 0
+    # the largest step that is tried, lowered whenever a step would make
+    # more than max_nodes nodes and raised again after every step that did not
+    largest_step = None
+    # the nodes left by the last compact(); the table is compacted again
+    # once it holds more than max_nodes and twice that many
+    live_nodes = 0
+
+    for n in generations:
+        if n < generation:
+            raise ValueError("The generations must be in increasing order.")
+
+        while generation < n:
+            j = (n - generation).bit_length() - 1
+            if largest_step is not None:
+                j = min(j, largest_step)
+            if len(hashlife.children) >= hashlife.max_nodes:
+                # the pattern alone needs more nodes than max_nodes: one
+                # generation at a time, which is always taken
+                j = 0
+            reach = generation + (1 << j)
+            # grow the root until its middle half holds the light cone
+            # 2**j generations on
+            while True:
+                level = hashlife.levels[root]
+                quarter = 1 << (level - 2)
+                if level - 2 >= j and origin + quarter <= -reach and origin + 3*quarter >= cell_number + reach:
+                    break
+                fill = hashlife.background(level - 1, background_at(hashlife.rule_table, generation))
+                left, right = hashlife.children[root]
+                root = hashlife.join(hashlife.join(fill, left), hashlife.join(right, fill))
+                origin -= 1 << (level - 1)
+
+            # a step that would take the node table past max_nodes is given
+            # up, and tried again as smaller steps from the compacted root
+            if j > 0:
+                hashlife.node_limit = hashlife.max_nodes
+            try:
+                root = hashlife.advance(root, j)
+                given_up = False
+            except NodeLimitReached:
+                given_up = True
+            finally:
+                hashlife.node_limit = None
+            if given_up:
+                root = hashlife.compact(root)
+                live_nodes = len(hashlife.children)
+                largest_step = j - 1
+                continue
+            origin += quarter
+            generation = reach
+            if largest_step is not None:
+                largest_step += 1
+
+            if len(hashlife.children) > max(hashlife.max_nodes, 2*live_nodes):
+                root = hashlife.compact(root)
+                live_nodes = len(hashlife.children)
+
+        width = cell_number + 2*n
+        row_start = 0 if start is None else max(start, 0)
+        row_stop = width if stop is None else min(stop, width)
+        # cell x of the row is cell x - n of the grid, cell x - n - origin of
+        # the root
+        shift = -n - origin
+        yield np.array(hashlife.cells(root, row_start + shift, max(row_stop, row_start) + shift), dtype=np.uint8)
+
+def state_at(initial_config, rule_num, n, start=None, stop=None, max_nodes=2**20):
+    # generation n of the infinite grid without the generations before it
+    return next(iter_states(initial_config, rule_num, [n], start, stop, max_nodes))
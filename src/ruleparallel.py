@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+import itertools, os, shlex
+
+import rulegenerator
+
+# Runs many simulations at once on a pool of processes. A job for run_jobs is
+# a tuple (generations, initial_config, rule_num) or (generations,
+# initial_config, rule_num, wrap_width), like the arguments of generate_rule
+# and generate_rule_wrap. The jobs are sent to the processes in chunks, and
+# every chunk writes its grids into one block of shared memory, from which
+# they are read back without being pickled. Only a couple of chunks per
+# process are sent ahead, and each block is freed as soon as its grids have
+# been read back. parallel_rules_wrap instead
+# splits one wide wrapped grid between threads
+
+def job_cells(job):
+    # the most cells the grid of a job can take up: the numpy engines never
+    # go more than three cells past the light cone on either side
+    generations, initial_config, rule_num = job[:3]
+    wrap_width = job[3] if len(job) > 3 else None
+    rows = rulegenerator.bitpacked_shape(generations, initial_config, rule_num, wrap_width)[0]
+    if wrap_width is not None:
+        return rows * wrap_width
+    return rows * (rulegenerator.light_cone_width(initial_config, max(rows, 1)) + 6)
+
+def simulate_job(job):
+    import numpy as np
+
+    generations, initial_config, rule_num = job[:3]
+    wrap_width = job[3] if len(job) > 3 else None
+    if wrap_width is None:
+        return rulegenerator.vectorized_rules(generations, initial_config, rule_num)
+    if not rulegenerator.wrap_supported(initial_config, wrap_width):
+        # left to the original engines, like generate_rule_wrap does; their
+        # rows are never wider than wrap_width
+        grid = rulegenerator.generate_rule_wrap(generations, initial_config, rule_num, wrap_width)
+        width = len(grid[0]) if len(grid) > 0 else wrap_width
+        return np.array([list(row) for row in grid], dtype=np.uint8).reshape(len(grid), width)
+    return rulegenerator.vectorized_rules_wrap(generations, initial_config, rule_num, wrap_width)
+
+def run_chunk(name, chunk):
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    block = shared_memory.SharedMemory(name=name)
+    shapes = []
+    try:
+        for offset, job in chunk:
+            auto_lattice = simulate_job(job)
+            out = np.ndarray(auto_lattice.shape, dtype=np.uint8, buffer=block.buf, offset=offset)
+            out[...] = auto_lattice
+            del out
+            shapes.append(auto_lattice.shape)
+    finally:
+        block.close()
+    return shapes
+
+def chunk_jobs(jobs, workers, chunk_size):
+    if chunk_size is None:
+        # a few chunks per process, so that the processes finishing first
+        # pick up the remaining work
+        chunk_size = max(1, -(-len(jobs) // (workers * 4)))
+    return [list(range(i, min(i + chunk_size, len(jobs)))) for i in range(0, len(jobs), chunk_size)]
+
+def run_jobs(jobs, workers=None, chunk_size=None, progress=None):
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    jobs = list(jobs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    results = [None] * len(jobs)
+    done = 0
+    chunks = iter(chunk_jobs(jobs, workers, chunk_size))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        try:
+            while True:
+                # two chunks per process are kept queued, each with a block
+                # made for it as it is sent
+                for indices in itertools.islice(chunks, 2*workers - len(futures)):
+                    chunk = []
+                    size = 0
+                    for i in indices:
+                        chunk.append((size, jobs[i]))
+                        size += job_cells(jobs[i])
+                    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+                    futures[executor.submit(run_chunk, block.name, chunk)] = (block, indices, chunk)
+                if not futures:
+                    break
+
+                finished, pending = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    block, indices, chunk = futures.pop(future)
+                    try:
+                        for i, (offset, job), shape in zip(indices, chunk, future.result()):
+                            auto_lattice = np.ndarray(shape, dtype=np.uint8, buffer=block.buf, offset=offset)
+                            results[i] = rulegenerator.Lattice(auto_lattice.copy())
+                            del auto_lattice
+                    finally:
+                        block.close()
+                        block.unlink()
+                    done += len(indices)
+                    if progress is not None:
+                        progress(done, len(jobs))
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            for block, indices, chunk in futures.values():
+                block.close()
+                block.unlink()
+
+    return results
+
+def read_jobs(path):
+    # one job per line, written as the arguments of the command line
+    # interface; blank lines and lines starting with # are skipped
+    jobs = []
+    with open(path) as job_file:
+        for line in job_file:
+            line = line.strip()
+            if line != '' and not line.startswith('#'):
+                jobs.append(line)
+    return jobs
+
+def render_line(line):
+    # the status of main for one job line, 1 if it raised
+    try:
+        return rulegenerator.main(['rulegenerator.py'] + shlex.split(line))
+    except Exception as error:
+        print("Failed to render " + line + ": " + repr(error))
+        return 1
+
+def render_chunk(lines):
+    # the positions in lines of the lines whose image could not be rendered
+    return [i for i, line in enumerate(lines) if render_line(line) != 0]
+
+def render_jobs(lines, workers=None, chunk_size=None, progress=None):
+    # renders the image of every job line as the command line interface
+    # would, and returns the lines that failed in their order in lines
+    lines = list(lines)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    done = 0
+    failed = set()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(render_chunk, [lines[i] for i in indices]): indices
+                   for indices in chunk_jobs(lines, workers, chunk_size)}
+        for future in as_completed(futures):
+            indices = futures[future]
+            failed.update(indices[i] for i in future.result())
+            done += len(indices)
+            if progress is not None:
+                progress(done, len(lines))
+
+    return [lines[i] for i in sorted(failed)]
+
+def evolve_stripe(auto_lattice, rule_table, generation, steps, start, stop):
+    # evolves the cells start to stop of a generation `steps` generations
+    # further, from a copy of them with `steps` cells on either side taken
+    # around the torus: the outermost cells are lost each generation, so the
+    # copy only depends on the other stripes once every `steps` generations
+    import numpy as np
+
+    wrap_width = auto_lattice.shape[1]
+    if start - steps >= 0 and stop + steps <= wrap_width:
+        row = auto_lattice[generation, start - steps:stop + steps].copy()
+    else:
+        row = auto_lattice[generation].take(np.arange(start - steps, stop + steps), mode='wrap')
+
+    scratch = (np.empty(len(row) - 2, dtype=np.uint8), np.empty(len(row) - 2, dtype=np.uint8))
+    for i in range(steps):
+        row = rulegenerator.evolve_cells(rule_table, row, scratch=scratch)
+        adds = steps - 1 - i
+        auto_lattice[generation + 1 + i, start:stop] = row[adds:adds + stop - start]
+
+def parallel_rules_wrap(generations, initial_config, rule_num, wrap_width, workers=None, halo=1):
+    # vectorized_rules_wrap with the torus split into one stripe of columns
+    # per thread, the stripes meeting every `halo` generations
+    import numpy as np
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if halo < 1:
+        raise ValueError("The halo must be at least 1 cell wide.")
+    if generations < 2 or workers == 1:
+        return rulegenerator.vectorized_rules_wrap(generations, initial_config, rule_num, wrap_width)
+    rulegenerator.check_wrap(initial_config, wrap_width)
+
+    rule_table = np.array(rulegenerator.decode_rule(rule_num), dtype=np.uint8)
+    auto_lattice = np.empty((generations, wrap_width), dtype=np.uint8)
+    auto_lattice[0] = rulegenerator.torus_cells(initial_config, wrap_width)
+
+    stripe_width = -(-wrap_width // workers)
+    stripes = [(start, min(start + stripe_width, wrap_width)) for start in range(0, wrap_width, stripe_width)]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        generation = 0
+        while generation < generations - 1:
+            steps = min(halo, generations - 1 - generation)
+            futures = [executor.submit(evolve_stripe, auto_lattice, rule_table, generation, steps, start, stop)
+                       for start, stop in stripes]
+            for future in futures:
+                future.result()
+            generation += steps
+
+    return auto_lattice